@@ -0,0 +1,297 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+from .projection import create_bev_projection_maps, read_cam_from_json
+from .generate_bev_img import overlay_bev_imgs
+
+# WoodScape naming: the 4 images of a frame group have consecutive numbers, in front, left, right, rear order
+FRAME_PATTERN = re.compile(r"^(\d+)_(FV|MVL|MVR|RV)\.(png|jpg|jpeg)$", re.IGNORECASE)
+CAM_SUFFIXES = ("FV", "MVL", "MVR", "RV")
+MANIFEST_NAME = "manifest.jsonl"
+
+FrameGroup = namedtuple("FrameGroup", ["name", "image_files", "calib_files"])
+RigMaps = namedtuple("RigMaps", ["shm_name", "map_size", "xys_world"])
+
+
+def find_frame_groups(dataset_dir, image_dir="rgb_images", calib_dir="calibration"):
+    """
+    Walks dataset_dir for drives, i.e. directories holding both an image_dir and a calib_dir, and groups their images
+    by frame. Each image has a calibration json file of the same name in calib_dir.
+
+    :return: FrameGroup list sorted by name, which is the frame's front image path relative to dataset_dir without
+             extension
+    """
+    groups = []
+    for drive_dir, _, _ in os.walk(dataset_dir):
+        images_path, calibs_path = os.path.join(drive_dir, image_dir), os.path.join(drive_dir, calib_dir)
+        if not (os.path.isdir(images_path) and os.path.isdir(calibs_path)):
+            continue
+        frames = {}
+        for file_name in os.listdir(images_path):
+            match = FRAME_PATTERN.match(file_name)
+            if match:
+                frames[(int(match.group(1)), match.group(2).upper())] = file_name
+        for (number, suffix), file_name in frames.items():
+            if suffix != CAM_SUFFIXES[0]:
+                continue
+            file_names = [frames.get((number + i, cam_suffix)) for i, cam_suffix in enumerate(CAM_SUFFIXES)]
+            calib_files = [os.path.join(calibs_path, os.path.splitext(f)[0] + ".json") for f in file_names if f]
+            if None in file_names or not all(os.path.exists(f) for f in calib_files):
+                continue
+            name = os.path.relpath(os.path.join(images_path, os.path.splitext(file_name)[0]), dataset_dir)
+            groups.append(FrameGroup(name, [os.path.join(images_path, f) for f in file_names], calib_files))
+    return sorted(groups)
+
+
+def rig_key(calib_files, bev_settings):
+    """
+    Identifies the BEV maps of a frame group: sha256 of the calibrations' content and of the rendering settings.
+    """
+    configs = []
+    for calib_file in calib_files:
+        with open(calib_file) as f:
+            configs.append(json.load(f))
+    return configs_key(configs, bev_settings)
+
+
+def configs_key(configs, bev_settings):
+    """
+    Same as rig_key for calibrations already loaded, in the format of the calibration json files.
+    """
+    calibs = [{"intrinsic": config["intrinsic"], "extrinsic": config["extrinsic"]} for config in configs]
+    content = json.dumps({"calibs": calibs, "settings": bev_settings}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def read_manifest(output_dir):
+    """
+    :return: {frame group name: rig key} of the frames rendered by previous runs
+    """
+    done = {}
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line of an interrupted run
+                    continue
+                done[entry["frame"]] = entry["rig"]
+    return done
+
+
+def publish_maps(calib_files, bev_range, bev_size):
+    """
+    Builds the cv2.remap maps of the 4 cameras of a rig into one shared memory block: the map1 (int16) of all cameras
+    followed by their map2 (uint16). The caller owns the block and must unlink it.
+    """
+    cams = [read_cam_from_json(calib_file) for calib_file in calib_files]
+    map1_size = 4 * bev_size * bev_size * 2 * np.dtype(np.int16).itemsize
+    map2_size = 4 * bev_size * bev_size * np.dtype(np.uint16).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=map1_size + map2_size)
+    try:
+        map1s, map2s = _maps_views(shm, bev_size)
+        for cam_idx, cam in enumerate(cams):
+            map1s[cam_idx], map2s[cam_idx] = create_bev_projection_maps(cam, bev_range, bev_size)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, RigMaps(shm.name, bev_size, [cam.get_translation()[:2].tolist() for cam in cams])
+
+
+def _maps_views(shm, bev_size):
+    map1s = np.ndarray((4, bev_size, bev_size, 2), dtype=np.int16, buffer=shm.buf)
+    map2s = np.ndarray((4, bev_size, bev_size), dtype=np.uint16, buffer=shm.buf, offset=map1s.nbytes)
+    return map1s, map2s
+
+
+# Shared memory blocks attached by a worker process, most recent last
+_worker_maps = OrderedDict()
+
+
+def _init_worker():
+    # Parallelism comes from the processes
+    cv2.setNumThreads(1)
+
+
+def _attached_maps(rig_maps, max_attached=2):
+    if rig_maps.shm_name not in _worker_maps:
+        shm = shared_memory.SharedMemory(name=rig_maps.shm_name)
+        _worker_maps[rig_maps.shm_name] = (shm, _maps_views(shm, rig_maps.map_size))
+        while len(_worker_maps) > max_attached:
+            _, (old_shm, _) = _worker_maps.popitem(last=False)
+            old_shm.close()
+    _worker_maps.move_to_end(rig_maps.shm_name)
+    return _worker_maps[rig_maps.shm_name][1]
+
+
+def render_frame_group(group, rig_maps, output_file, overlay_opt, bev_range):
+    """
+    Worker task: renders the BEV image of a frame group with the maps of its rig and writes it to output_file.
+    """
+    map1s, map2s = _attached_maps(rig_maps)
+    bev_imgs = []
+    for cam_idx, image_file in enumerate(group.image_files):
+        img = cv2.imread(image_file)
+        if img is None:
+            raise ValueError(f"cannot read image {image_file}")
+        bev_imgs.append(cv2.remap(img, map1s[cam_idx], map2s[cam_idx], cv2.INTER_CUBIC))
+    bev_img_all = overlay_bev_imgs(bev_imgs, rig_maps.xys_world, overlay_opt, bev_range, rig_maps.map_size)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    # Write then rename so that an interrupted run never leaves a partial image behind
+    tmp_file = f"{output_file}.tmp{os.path.splitext(output_file)[1]}"
+    cv2.imwrite(tmp_file, bev_img_all)
+    os.replace(tmp_file, output_file)
+    return group.name
+
+
+def generate_bev_dataset(dataset_dir, output_dir, image_dir="rgb_images", calib_dir="calibration", overlay_opt='all',
+                         bev_range=25, bev_size=640, num_workers=1, image_ext=".png", max_live_rigs=2, verbose=True):
+    """
+    Renders the BEV image of every frame group of a dataset to output_dir, with the same relative path as its front
+    image. Frame groups are grouped by rig calibration: the maps of each rig are built once and shared with the worker
+    processes through shared memory. Rendered frames are appended to the manifest of output_dir, and are skipped by
+    later runs unless their calibration or the rendering settings changed.
+
+    Frame groups that fail, e.g. because of an unreadable image or calibration, are reported and skipped, and left out
+    of the manifest so that the next run retries them.
+
+    :param max_live_rigs: number of rigs whose maps are kept in shared memory at the same time
+    :return: number of rendered frame groups
+    """
+    assert overlay_opt in ['fr', 'lr', 'all']
+    os.makedirs(output_dir, exist_ok=True)
+    bev_settings = {"overlay": overlay_opt, "bev_range": bev_range, "bev_size": bev_size}
+    done = read_manifest(output_dir)
+
+    failed = []
+
+    def report_failure(group, e):
+        failed.append(group.name)
+        print(f"Failed to render {group.name}: {type(e).__name__}: {e}")
+
+    rigs = OrderedDict()
+    for group in find_frame_groups(dataset_dir, image_dir, calib_dir):
+        try:
+            key = rig_key(group.calib_files, bev_settings)
+        except Exception as e:
+            # e.g. a calibration that is not valid json
+            report_failure(group, e)
+            continue
+        output_file = os.path.join(output_dir, group.name + image_ext)
+        if done.get(group.name) == key and os.path.exists(output_file):
+            continue
+        rigs.setdefault(key, []).append((group, output_file))
+    num_todo = sum(len(groups) for groups in rigs.values())
+    if verbose:
+        print(f"{num_todo} frame groups to render with {len(rigs)} rigs, {len(done)} in the manifest")
+
+    start = time.perf_counter()
+    num_done = 0
+    live_rigs = {}
+    pending = {}
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a") as manifest, \
+            ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker) as executor:
+
+        def collect(return_when):
+            nonlocal num_done
+            finished, _ = wait(list(pending), return_when=return_when)
+            for future in finished:
+                key, group = pending.pop(future)
+                try:
+                    manifest.write(json.dumps({"frame": future.result(), "rig": key}) + "\n")
+                    num_done += 1
+                except Exception as e:
+                    # e.g. an unreadable image: the frame is reported and retried by the next run
+                    report_failure(group, e)
+                live_rigs[key][1] -= 1
+                if live_rigs[key][1] == 0:
+                    shm, _ = live_rigs.pop(key)
+                    shm.close()
+                    shm.unlink()
+            manifest.flush()
+            if verbose and finished:
+                print(f"{num_done}/{num_todo} frame groups, {num_done / (time.perf_counter() - start):.1f} per second")
+
+        try:
+            for key, groups in rigs.items():
+                while len(live_rigs) >= max_live_rigs:
+                    collect(FIRST_COMPLETED)
+                try:
+                    shm, rig_maps = publish_maps(groups[0][0].calib_files, bev_range, bev_size)
+                except Exception as e:
+                    # e.g. a calibration with missing fields: all the frames of the rig are skipped
+                    for group, _ in groups:
+                        report_failure(group, e)
+                    continue
+                live_rigs[key] = [shm, len(groups)]
+                for group, output_file in groups:
+                    future = executor.submit(render_frame_group, group, rig_maps, output_file, overlay_opt, bev_range)
+                    pending[future] = (key, group)
+            while pending:
+                collect(FIRST_COMPLETED)
+        finally:
+            for future in pending:
+                future.cancel()
+            for shm, _ in live_rigs.values():
+                shm.close()
+                shm.unlink()
+    if failed and verbose:
+        print(f"{len(failed)} frame groups failed and were skipped")
+    return num_done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the BEV images of all frame groups of a dataset in "
+                                                 "parallel. Frames already rendered are skipped.")
+    parser.add_argument("--dataset", required=True,
+                        help="dataset directory, searched recursively for drives with image and calibration dirs")
+    parser.add_argument("--output-dir", required=True, help="directory the BEV images and the manifest are written to")
+    parser.add_argument("--image-dir", default="rgb_images", help="name of the image directory of a drive")
+    parser.add_argument("--calib-dir", default="calibration",
+                        help="name of the calibration directory of a drive, with one json file per image")
+    parser.add_argument("--bev-range", type=float, default=25, help="BEV range in meters")
+    parser.add_argument("--bev-size", type=int, default=640, help="BEV image size in pixels")
+    parser.add_argument("--overlay", choices=["fr", "lr", "all"], default="all")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    generate_bev_dataset(args.dataset, args.output_dir, args.image_dir, args.calib_dir, args.overlay, args.bev_range,
+                         args.bev_size, args.num_workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+import numpy as np
+import cv2
+from .projection import cam_from_config, create_bev_projection_maps
+from .generate_bev_img import overlay_bev_imgs
+from .batch_bev import configs_key
+
+IMAGE_TYPES = {"png": "image/png", "jpg": "image/jpeg"}
+
+
+class ServiceStats(object):
+    """
+    Thread-safe latency and throughput counters of a BevService.
+    """
+    def __init__(self, num_latencies=1000):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._latencies = deque(maxlen=num_latencies)
+        self.counters = {"requests": 0, "errors": 0, "batches": 0, "map_hits": 0, "map_misses": 0}
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def add_latency(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = np.array(self._latencies)
+        uptime = time.perf_counter() - self._start
+        snapshot = {**counters, "uptime_s": uptime, "requests_per_s": counters["requests"] / uptime,
+                    "requests_per_batch": counters["requests"] / max(1, counters["batches"])}
+        if latencies.size > 0:
+            snapshot.update({"latency_ms_p50": 1000 * float(np.percentile(latencies, 50)),
+                             "latency_ms_p95": 1000 * float(np.percentile(latencies, 95)),
+                             "latency_ms_max": 1000 * float(latencies.max())})
+        return snapshot
+
+
+class BevService(object):
+    """
+    Renders BEV images like generate_bev_all_cams, with the cameras and remap maps of recently used rigs kept in
+    memory, keyed by the sha256 of their calibrations and of the BEV range and size. Concurrent requests for the same
+    rig are batched: the first one waits batch_window seconds for others, then the batch shares a single map lookup
+    (or build) and its images are remapped together on the worker threads. render() is thread-safe.
+    """
+    def __init__(self, cache_size=8, num_workers=1, batch_window=0.005, max_bev_size=4096, max_bev_range=1000):
+        """
+        :param cache_size: number of rigs whose maps are kept
+        :param num_workers: number of threads remapping the cameras (cv2.remap releases the GIL)
+        :param max_bev_size: largest BEV image size in pixels a request may ask for, it bounds the memory of the maps
+        :param max_bev_range: largest BEV range in meters a request may ask for
+        """
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_bev_size = max_bev_size
+        self.max_bev_range = max_bev_range
+        self.stats = ServiceStats()
+        self._lock = threading.Lock()
+        self._maps = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def render(self, configs, imgs, overlay_opt='all', bev_range=25, bev_size=640):
+        """
+        :param configs: calibrations of the cameras in front, left, right, rear order, as in the calibration json files
+        :param imgs: fisheye images in the same order
+        """
+        assert overlay_opt in ['fr', 'lr', 'all']
+        assert len(configs) == 4 and len(imgs) == 4
+        if not 0 < bev_size <= self.max_bev_size:
+            raise ValueError(f"bev_size must be in [1, {self.max_bev_size}], got {bev_size}")
+        if not 0 < bev_range <= self.max_bev_range:
+            raise ValueError(f"bev_range must be in (0, {self.max_bev_range}], got {bev_range}")
+        key = configs_key(configs, {"bev_range": bev_range, "bev_size": bev_size})
+        future = Future()
+        with self._lock:
+            batch = self._pending.setdefault(key, [])
+            batch.append((imgs, overlay_opt, future))
+            is_leader = len(batch) == 1
+        if is_leader:
+            self._run_batch(key, configs, bev_range, bev_size)
+        return future.result()
+
+    def _run_batch(self, key, configs, bev_range, bev_size):
+        time.sleep(self.batch_window)
+        with self._lock:
+            batch = self._pending.pop(key)
+        self.stats.count("batches")
+        try:
+            xys_world, maps = self._rig_maps(key, configs, bev_range, bev_size)
+            layers = list(self._executor.map(lambda args: cv2.remap(args[0], *maps[args[1]], cv2.INTER_CUBIC),
+                                             [(img, cam_idx) for imgs, _, _ in batch
+                                              for cam_idx, img in enumerate(imgs)]))
+            for request_idx, (_, overlay_opt, future) in enumerate(batch):
+                future.set_result(overlay_bev_imgs(layers[4 * request_idx:4 * request_idx + 4], xys_world, overlay_opt,
+                                                   bev_range, bev_size))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _rig_maps(self, key, configs, bev_range, bev_size):
+        """
+        Cached (camera positions, maps of each camera) of a rig. A rig requested again while its maps are being built
+        waits for that build.
+        """
+        with self._lock:
+            entry = self._maps.get(key)
+            is_builder = entry is None
+            if is_builder:
+                entry = self._maps[key] = Future()
+                if len(self._maps) > self.cache_size:
+                    self._maps.popitem(last=False)
+            else:
+                self._maps.move_to_end(key)
+        if not is_builder:
+            self.stats.count("map_hits")
+            return entry.result()
+
+        self.stats.count("map_misses")
+        try:
+            cams = [cam_from_config(config) for config in configs]
+            maps = list(self._executor.map(lambda cam: create_bev_projection_maps(cam, bev_range, bev_size), cams))
+            entry.set_result(([cam.get_translation()[:2] for cam in cams], maps))
+        except Exception as e:
+            with self._lock:
+                self._maps.pop(key, None)
+            entry.set_exception(e)
+        return entry.result()
+
+
+def _decode_image(source):
+    """
+    :param source: path of an image file readable by the server, or {"base64": encoded image file}
+    """
+    if isinstance(source, dict):
+        img = cv2.imdecode(np.frombuffer(base64.b64decode(source["base64"]), np.uint8), cv2.IMREAD_COLOR)
+    else:
+        img = cv2.imread(source)
+    if img is None:
+        raise ValueError(f"cannot read image {source if isinstance(source, str) else '(base64)'}")
+    return img
+
+
+class BevRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /render with a json body {"calibs": [...], "images": [...], "overlay": "all", "bev_range": 25,
+    "bev_size": 640, "format": "png"} returns the encoded BEV image. calibs and images are in front, left, right, rear
+    order: calibs are calibration json contents or paths, images are paths or {"base64": ...} encoded files.
+    GET /stats returns the service counters as json.
+    """
+    service = None
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, "application/json", json.dumps(self.service.stats.snapshot()).encode())
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._send(404, "text/plain", b"not found")
+            return
+        start = time.perf_counter()
+        stats = self.service.stats
+        stats.count("requests")
+        try:
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            configs = [self._read_config(calib) for calib in request["calibs"]]
+            imgs = [_decode_image(source) for source in request["images"]]
+            image_format = request.get("format", "png")
+            if image_format not in IMAGE_TYPES:
+                raise ValueError(f"format must be one of {sorted(IMAGE_TYPES)}")
+            bev_img = self.service.render(configs, imgs, request.get("overlay", "all"),
+                                          float(request.get("bev_range", 25)), int(request.get("bev_size", 640)))
+            body = cv2.imencode(f".{image_format}", bev_img)[1].tobytes()
+        except (ValueError, KeyError, TypeError, AssertionError, OSError, cv2.error) as e:
+            stats.count("errors")
+            self._send(400, "text/plain", f"{type(e).__name__}: {e}".encode())
+            return
+        except Exception as e:
+            # e.g. the service was closed or ran out of memory: still answer, the connection would be dropped otherwise
+            stats.count("errors")
+            self._send(500, "text/plain", f"{type(e).__name__}: {e}".encode())
+            return
+        self._send(200, IMAGE_TYPES[image_format], body)
+        stats.add_latency(time.perf_counter() - start)
+
+    @staticmethod
+    def _read_config(calib):
+        if isinstance(calib, str):
+            with open(calib) as f:
+                return json.load(f)
+        return calib
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else self.server.server_address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    http.client connection to a server listening on a Unix socket, for clients of a BEV service run with
+    --unix-socket.
+    """
+    def __init__(self, socket_path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def make_server(service, host="127.0.0.1", port=8765, unix_socket=None, verbose=False):
+    """
+    HTTP server of a BevService, listening on a TCP port or, if unix_socket is given, on that Unix socket. Run it with
+    serve_forever().
+    """
+    handler = type("Handler", (BevRequestHandler,), {"service": service})
+    if unix_socket:
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve BEV images over HTTP, with the maps of recently used rigs "
+                                                 "kept in memory.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--cache-size", type=int, default=8, help="number of rigs whose maps are kept in memory")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count(), help="number of remap threads")
+    parser.add_argument("--batch-window-ms", type=float, default=5,
+                        help="time a request waits for concurrent requests of the same rig to batch with")
+    parser.add_argument("--max-bev-size", type=int, default=4096,
+                        help="largest BEV image size in pixels a request may ask for")
+    parser.add_argument("--max-bev-range", type=float, default=1000,
+                        help="largest BEV range in meters a request may ask for")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    service = BevService(args.cache_size, args.num_workers, args.batch_window_ms / 1000, args.max_bev_size,
+                         args.max_bev_range)
+    server = make_server(service, args.host, args.port, args.unix_socket, args.verbose)
+    print(f"Serving BEV images on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == '__main__':
+    main()
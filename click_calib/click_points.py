@@ -0,0 +1,162 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import os
+import numpy as np
+from .projection import Camera, read_cam_from_json
+from .utils import CAM_PAIRS, read_points, write_points, example_image_files
+
+
+def zoom(event):
+    ax = event.inaxes
+    if ax is None:
+        return
+    xdata, ydata = event.xdata, event.ydata
+    x, y = ax.get_xlim(), ax.get_ylim()
+    if event.button == 'up':      # Zoom in on scroll up
+        ax.set_xlim(xdata - (xdata - x[0]) / 1.1, xdata + (x[1] - xdata) / 1.1)
+        ax.set_ylim(ydata - (ydata - y[0]) / 1.1, ydata + (y[1] - ydata) / 1.1)
+    elif event.button == 'down':  # Zoom out on scroll down
+        ax.set_xlim(xdata - (xdata - x[0]) * 1.1, xdata + (x[1] - xdata) * 1.1)
+        ax.set_ylim(ydata - (ydata - y[0]) * 1.1, ydata + (y[1] - ydata) * 1.1)
+    ax.figure.canvas.draw()
+
+
+def predict_correspondence(source_cam: Camera, destination_cam: Camera, pt):
+    """
+    Predicts where a pixel of source_cam is seen in destination_cam, assuming it lies on the ground. Returns None if
+    its ray does not hit the ground or if it falls outside destination_cam.
+    """
+    pt = np.array([pt], dtype=float)
+    ray_z = source_cam.project_2d_to_3d(pt, norm=np.array([1]))[0, 2] - source_cam.translation[2]
+    if not ray_z < 0:
+        return None
+    pt_pred = destination_cam.project_3d_to_2d(source_cam.project_2d_to_3d_ground(pt), do_clip=True)[0]
+    return None if np.any(np.isnan(pt_pred)) else pt_pred
+
+
+def click_points(img_1_path, img_2_path, cam_1: Camera = None, cam_2: Camera = None, search_window=40):
+    """
+    Opens both images side by side and returns the keypoints clicked in each of them once the window is closed.
+
+    If both cameras are given, each click is projected to the ground and into the other camera, where the predicted
+    location is drawn with a search window of +/- search_window pixels.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.image as mpimg
+
+    pts_1 = []
+    pts_2 = []
+    img1 = mpimg.imread(img_1_path)
+    img2 = mpimg.imread(img_2_path)
+
+    fig, (ax1, ax2) = plt.subplots(1, 2)
+    ax1.imshow(img1)
+    ax1.set_title('Cam_1', fontsize=10)
+    ax1.axis('off')
+    ax2.imshow(img2)
+    ax2.set_title('Cam_2', fontsize=10)
+    ax2.axis('off')
+
+    fig.text(0.5, 0.94, 'Click-Calib', fontsize=12, fontweight='bold', ha='center')
+    fig.suptitle('Click to select keypoints in both cameras. Scroll to zoom.\n'
+                 'Keypoints with the same index in both images should match in world.\n'
+                 'The number of selected keypoints must be equal in each camera.', fontsize=10, y=0.9, linespacing=2)
+
+    pred_artists = []
+
+    def draw_prediction(source_cam, destination_cam, ax_pred, x, y):
+        for artist in pred_artists:
+            artist.remove()
+        pred_artists.clear()
+        pt_pred = predict_correspondence(source_cam, destination_cam, (x, y))
+        if pt_pred is not None:
+            pred_artists.extend(ax_pred.plot(pt_pred[0], pt_pred[1], 'c+', markersize=8))
+            pred_artists.append(ax_pred.add_patch(plt.Rectangle(
+                (pt_pred[0] - search_window, pt_pred[1] - search_window), 2 * search_window, 2 * search_window,
+                fill=False, edgecolor='c', linewidth=0.8)))
+
+    def onclick(event):
+        if event.inaxes in (ax1, ax2) and cam_1 is not None and cam_2 is not None:
+            if event.inaxes == ax1:
+                draw_prediction(cam_1, cam_2, ax2, event.xdata, event.ydata)
+            else:
+                draw_prediction(cam_2, cam_1, ax1, event.xdata, event.ydata)
+        if event.inaxes == ax1:
+            x, y = event.xdata, event.ydata
+            pts_1.append((int(x), int(y)))
+            pt_1_idx = len(pts_1)
+            ax1.plot(x, y, 'ro', markersize=3)
+            ax1.annotate(f"{pt_1_idx}", (x, y), color=(0.70, 1, 0.40), fontsize=6)
+        elif event.inaxes == ax2:
+            x, y = event.xdata, event.ydata
+            pts_2.append((int(x), int(y)))
+            pt_2_idx = len(pts_2)
+            ax2.plot(x, y, 'ro', markersize=3)
+            ax2.annotate(f"{pt_2_idx}", (x, y), color=(0.70, 1, 0.40), fontsize=6)
+        fig.canvas.draw()
+
+    fig.canvas.mpl_connect('button_press_event', onclick)
+    fig.canvas.mpl_connect('scroll_event', zoom)
+    plt.show()
+    return pts_1, pts_2
+
+
+def main(argv=None):
+    pair_names = [f"{cam_a}_{cam_b}" for cam_a, cam_b in CAM_PAIRS]
+    parser = argparse.ArgumentParser(description="Click keypoints in a pair of adjacent camera images.")
+    parser.add_argument("images", nargs="*", metavar="IMAGE", default=example_image_files()[:2],
+                        help="the 2 images of the pair (default: example front and left images)")
+    parser.add_argument("--output", help="keypoints json file to store the clicked points in (see optimize.py)")
+    parser.add_argument("--pair", choices=pair_names, default=pair_names[0],
+                        help="pair of cameras the 2 images belong to, in this order")
+    parser.add_argument("--calibs", nargs=2, metavar=("CALIB_1", "CALIB_2"),
+                        help="current calibrations of both cameras, to show where each click is expected in the other "
+                             "camera")
+    parser.add_argument("--search-window", type=int, default=40,
+                        help="half size in pixels of the search window drawn around predicted points")
+    args = parser.parse_args(argv)
+    if len(args.images) != 2:
+        parser.error("exactly 2 images are required")
+
+    # Cameras are loaded once, each prediction only projects a single point
+    cam_1, cam_2 = [read_cam_from_json(calib_f) for calib_f in args.calibs] if args.calibs else (None, None)
+    pts_1, pts_2 = click_points(*args.images, cam_1, cam_2, args.search_window)
+
+    assert len(pts_1) == len(pts_2), "The number of points in two cameras must be the same!"
+    print(f"Points in cam 1: {pts_1}")
+    print(f"Points in cam 2: {pts_2}")
+
+    if args.output:
+        # Other pairs already stored in the file are kept
+        if os.path.exists(args.output):
+            pts_pairs = read_points(args.output)
+        else:
+            pts_pairs = [{cam_a: [], cam_b: []} for cam_a, cam_b in CAM_PAIRS]
+        cam_a, cam_b = CAM_PAIRS[pair_names.index(args.pair)]
+        pts_pairs[pair_names.index(args.pair)] = {cam_a: pts_1, cam_b: pts_2}
+        write_points(pts_pairs, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import hashlib
+import os
+import numpy as np
+import cv2
+from .projection import CameraRig, create_bev_projection_maps
+from .utils import read_points, read_maps, write_maps, example_calib_files, CAM_NAMES, CAM_PAIRS
+
+
+def calc_mean_dist_error_rig(rig: CameraRig, pts_pairs):
+    """
+    Mean distance error of the keypoints, i.e. mean distance between the ground projections of matching keypoints, for
+    a rig whose cameras are named as in CAM_NAMES. The keypoints of all pairs are projected in a single call.
+
+    :param pts_pairs: keypoints of each pair in CAM_PAIRS order, see utils.read_points
+    """
+    cam_ids_a, cam_ids_b, pts_a, pts_b = [], [], [], []
+    for (cam_a, cam_b), pair in zip(CAM_PAIRS, pts_pairs):
+        assert len(pair[cam_a]) == len(pair[cam_b])
+        cam_ids_a += [rig.names.index(cam_a)] * len(pair[cam_a])
+        cam_ids_b += [rig.names.index(cam_b)] * len(pair[cam_b])
+        pts_a.append(np.reshape(pair[cam_a], (-1, 2)))
+        pts_b.append(np.reshape(pair[cam_b], (-1, 2)))
+    num_pts = len(cam_ids_a)
+    pts_world = rig.project_2d_to_3d_ground(np.array(cam_ids_a + cam_ids_b, dtype=int), np.concatenate(pts_a + pts_b))
+    return np.linalg.norm(pts_world[:num_pts] - pts_world[num_pts:], axis=1).sum() / num_pts
+
+
+def load_bev_maps(cam, calib_path, bev_range, bev_size, maps_dir=None):
+    """
+    BEV remap tables of a camera, cached in maps_dir (if given) by the content of its calibration file and the BEV
+    parameters. A cached file that cannot be read, e.g. truncated, is rebuilt.
+    """
+    if maps_dir is None:
+        return create_bev_projection_maps(cam, bev_range, bev_size)
+    with open(calib_path, "rb") as f:
+        key = hashlib.sha256(f.read() + f"{bev_range}_{bev_size}".encode()).hexdigest()
+    maps_path = os.path.join(maps_dir, f"{key}.maps")
+    try:
+        return read_maps(maps_path)
+    except (FileNotFoundError, ValueError):
+        pass
+    os.makedirs(maps_dir, exist_ok=True)
+    write_maps(*create_bev_projection_maps(cam, bev_range, bev_size), maps_path)
+    return read_maps(maps_path)
+
+
+def calc_overlap_scores(imgs, maps, mode="gradient", erode_px=3, min_overlap_px=100, bev_mask=None):
+    """
+    Photometric consistency of each pair of adjacent cameras in their overlap on the BEV grid, which needs no clicked
+    keypoints: the zero-mean normalized cross-correlation of the BEV intensities (mode "intensity") or gradient
+    magnitudes (mode "gradient", robust to exposure differences) of both cameras. 1 is perfect alignment.
+
+    :param imgs: images of the cameras in CAM_NAMES order
+    :param maps: BEV remap tables (map1, map2) of the cameras in CAM_NAMES order
+    :param erode_px: overlap border removed, where interpolation mixes in the border
+    :param bev_mask: optional boolean mask of the BEV pixels to score, e.g. to leave out the vehicle
+    :return: score of each pair in CAM_PAIRS order, nan if the overlap has less than min_overlap_px pixels
+    """
+    assert mode in ["intensity", "gradient"]
+    kernel = np.ones((2 * erode_px + 1, 2 * erode_px + 1), dtype=np.uint8)
+    bev_imgs, masks = [], []
+    for img, (map1, map2) in zip(imgs, maps):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        bev = cv2.remap(gray.astype(np.float32), map1, map2, cv2.INTER_LINEAR)
+        if mode == "gradient":
+            bev = cv2.magnitude(cv2.Sobel(bev, cv2.CV_32F, 1, 0), cv2.Sobel(bev, cv2.CV_32F, 0, 1))
+        valid = cv2.remap(np.ones(gray.shape, dtype=np.uint8), map1, map2, cv2.INTER_NEAREST,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        bev_imgs.append(bev)
+        masks.append(cv2.erode(valid, kernel) > 0)
+
+    scores = []
+    for cam_a, cam_b in CAM_PAIRS:
+        idx_a, idx_b = CAM_NAMES.index(cam_a), CAM_NAMES.index(cam_b)
+        overlap = masks[idx_a] & masks[idx_b]
+        if bev_mask is not None:
+            overlap &= bev_mask
+        if np.count_nonzero(overlap) < min_overlap_px:
+            scores.append(np.nan)
+            continue
+        values_a = bev_imgs[idx_a][overlap] - bev_imgs[idx_a][overlap].mean()
+        values_b = bev_imgs[idx_b][overlap] - bev_imgs[idx_b][overlap].mean()
+        norm = np.sqrt(np.dot(values_a, values_a) * np.dot(values_b, values_b))
+        scores.append(float(np.dot(values_a, values_b) / norm) if norm > 0 else np.nan)
+    return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the mean distance error (MDE) of a surround-view system "
+                                                 "calibration on clicked keypoints, and/or the photometric overlap "
+                                                 "consistency of its cameras.")
+    parser.add_argument("--calibs", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_calib_files("optimized"), help="calibration json files")
+    parser.add_argument("--points", help="clicked keypoints json file, to compute the MDE")
+    parser.add_argument("--images", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        help="fisheye images, to also compute the photometric overlap consistency of each camera pair")
+    parser.add_argument("--overlap-mode", choices=["gradient", "intensity"], default="gradient")
+    parser.add_argument("--bev-range", type=float, default=12, help="BEV range in meters of the overlap scores")
+    parser.add_argument("--bev-size", type=int, default=256, help="BEV size in pixels of the overlap scores")
+    parser.add_argument("--maps-dir", help="directory to cache the BEV remap tables in")
+    args = parser.parse_args(argv)
+    if args.points is None and args.images is None:
+        parser.error("at least one of --points and --images is required")
+
+    rig = CameraRig.from_json(args.calibs, CAM_NAMES)
+    if args.points:
+        mean_dist_error = calc_mean_dist_error_rig(rig, read_points(args.points))
+        print("Mean distance error:", mean_dist_error)
+
+    if args.images:
+        imgs = [cv2.imread(img_f) for img_f in args.images]
+        maps = [load_bev_maps(rig.camera(i), calib_f, args.bev_range, args.bev_size, args.maps_dir)
+                for i, calib_f in enumerate(args.calibs)]
+        for (cam_a, cam_b), score in zip(CAM_PAIRS, calc_overlap_scores(imgs, maps, args.overlap_mode)):
+            print(f"Overlap consistency {cam_a}-{cam_b}: {score:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,464 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+import cv2
+from .projection import (Camera, cam_from_config, create_bev_projection_maps, create_bev_projection_maps_tile,
+                         read_cam_from_json, bev_points_world_to_img)
+
+
+_opencv_threads_lock = threading.Lock()
+_opencv_threads_users = 0
+_opencv_threads_prev = None
+
+
+@contextmanager
+def opencv_single_thread():
+    """
+    Sets OpenCV's internal threading to 1 while our own thread pools run, to avoid oversubscribing the cores.
+    cv2.setNumThreads is process-global, so overlapping users are counted and the previous setting is only restored
+    when the last one exits.
+    """
+    global _opencv_threads_users, _opencv_threads_prev
+    with _opencv_threads_lock:
+        if _opencv_threads_users == 0:
+            _opencv_threads_prev = cv2.getNumThreads()
+            cv2.setNumThreads(1)
+        _opencv_threads_users += 1
+    try:
+        yield
+    finally:
+        with _opencv_threads_lock:
+            _opencv_threads_users -= 1
+            if _opencv_threads_users == 0:
+                cv2.setNumThreads(_opencv_threads_prev)
+
+
+def generate_bev_one_cam(source_cam: Camera, source_img: np.ndarray, bev_range: int, bev_size: int):
+    map1, map2 = create_bev_projection_maps(source_cam, bev_range, bev_size)
+    bev_image = cv2.remap(source_img, map1, map2, cv2.INTER_CUBIC)
+    return bev_image
+
+def generate_bev_all_cams(cam_front, cam_left, cam_right, cam_rear, img_front, img_left, img_right, img_rear,
+                          overlay_opt='all', bev_range=25, bev_size=640, num_workers=1, tile_rows=64):
+    """
+    :param num_workers: number of threads used to build the maps and remap the cameras, split into row tiles.
+                        1 keeps everything on the calling thread.
+    :param tile_rows: number of BEV rows per tile when num_workers > 1
+    """
+    assert overlay_opt in ['fr', 'lr', 'all']
+    assert num_workers >= 1
+
+    cams = [cam_front, cam_left, cam_right, cam_rear]
+    imgs = [img_front, img_left, img_right, img_rear]
+    if num_workers == 1:
+        bev_imgs = [generate_bev_one_cam(cam, img, bev_range, bev_size) for cam, img in zip(cams, imgs)]
+    else:
+        # One task per camera and row tile builds the maps of its rows and remaps them. The projection is vectorized
+        # numpy and cv2.remap releases the GIL, so the tasks spread over all workers
+        bev_imgs = [np.empty((bev_size, bev_size) + img.shape[2:], dtype=img.dtype) for img in imgs]
+
+        def render_rows(cam_idx, row_start):
+            rows = slice(row_start, min(row_start + tile_rows, bev_size))
+            maps = create_bev_projection_maps_tile(cams[cam_idx], bev_range, bev_size, rows, slice(0, bev_size))
+            bev_imgs[cam_idx][rows] = cv2.remap(imgs[cam_idx], *maps, cv2.INTER_CUBIC).reshape(
+                bev_imgs[cam_idx][rows].shape)
+
+        tasks = [(cam_idx, row_start) for cam_idx in range(len(cams)) for row_start in range(0, bev_size, tile_rows)]
+        with opencv_single_thread(), ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(lambda task: render_rows(*task), tasks))
+    return overlay_bev_imgs(bev_imgs, [cam.get_translation()[:2] for cam in cams], overlay_opt, bev_range, bev_size)
+
+def overlay_bev_imgs(bev_imgs, xys_world, overlay_opt='all', bev_range=25, bev_size=640):
+    """
+    Composes the BEV images of the 4 cameras into one, as generate_bev_all_cams.
+
+    :param bev_imgs: BEV images of the cameras in front, left, right, rear order
+    :param xys_world: (x, y) world positions of the cameras, which bound the zones pasted from each camera
+    """
+    assert overlay_opt in ['fr', 'lr', 'all']
+    bev_img_front, bev_img_left, bev_img_right, bev_img_rear = bev_imgs
+    xy_world_front, xy_world_left, xy_world_right, xy_world_rear = xys_world
+
+    u_front_bev, v_front_bev = bev_points_world_to_img(bev_range, bev_size, xy_world_front)
+    u_left_bev, v_left_bev = bev_points_world_to_img(bev_range, bev_size, xy_world_left)
+    u_right_bev, v_right_bev = bev_points_world_to_img(bev_range, bev_size, xy_world_right)
+    u_rear_bev, v_rear_bev = bev_points_world_to_img(bev_range, bev_size, xy_world_rear)
+
+    bev_img_all = np.zeros(bev_img_front.shape).astype(np.uint8)
+    if overlay_opt == 'lr':
+        bev_img_all[0:v_front_bev, :] = bev_img_front[0:v_front_bev, :]
+        bev_img_all[v_rear_bev:bev_size, :] = bev_img_rear[v_rear_bev:bev_size, :]
+        bev_img_all[:, 0:u_left_bev] = bev_img_left[:, 0:u_left_bev]
+        bev_img_all[:, u_right_bev:bev_size] = bev_img_right[:, u_right_bev:bev_size]
+    elif overlay_opt == 'fr':
+        bev_img_all[:, 0:u_left_bev] = bev_img_left[:, 0:u_left_bev]
+        bev_img_all[:, u_right_bev:bev_size] = bev_img_right[:, u_right_bev:bev_size]
+        bev_img_all[0:v_front_bev, :] = bev_img_front[0:v_front_bev, :]
+        bev_img_all[v_rear_bev:bev_size, :] = bev_img_rear[v_rear_bev:bev_size, :]
+    else:
+        bev_img_all = (bev_img_front.astype(np.float32) + bev_img_left.astype(np.float32) +
+                       bev_img_right.astype(np.float32) + bev_img_rear.astype(np.float32)) / 4
+        bev_img_all = ((bev_img_all / bev_img_all.max()) * 255).astype(np.uint8)
+
+    return bev_img_all
+
+def generate_bev_all_cams_tiled(cam_front, cam_left, cam_right, cam_rear, img_front, img_left, img_right, img_rear,
+                                bev_img_all: np.ndarray, overlay_opt='all', bev_range=25, tile_size=512):
+    """
+    Out-of-core version of generate_bev_all_cams for very large BEV images: maps and composite are computed tile by
+    tile and written into bev_img_all, which is typically memory-mapped (np.memmap or np.lib.format.open_memmap). Peak
+    memory only depends on tile_size. The result is the same as generate_bev_all_cams.
+
+    :param bev_img_all: output array of shape (bev_size, bev_size, 3) and dtype uint8
+    """
+    assert overlay_opt in ['fr', 'lr', 'all']
+    bev_size = bev_img_all.shape[0]
+    assert bev_img_all.shape == (bev_size, bev_size, 3) and bev_img_all.dtype == np.uint8
+
+    cams = [cam_front, cam_left, cam_right, cam_rear]
+    imgs = [img_front, img_left, img_right, img_rear]
+    u_front_bev, v_front_bev = bev_points_world_to_img(bev_range, bev_size, cam_front.get_translation()[:2])
+    u_left_bev, v_left_bev = bev_points_world_to_img(bev_range, bev_size, cam_left.get_translation()[:2])
+    u_right_bev, v_right_bev = bev_points_world_to_img(bev_range, bev_size, cam_right.get_translation()[:2])
+    u_rear_bev, v_rear_bev = bev_points_world_to_img(bev_range, bev_size, cam_rear.get_translation()[:2])
+
+    # (camera index, rows, columns) pasted in this order, as in generate_bev_all_cams
+    zones_front_rear = [(0, slice(0, v_front_bev), slice(None)), (3, slice(v_rear_bev, bev_size), slice(None))]
+    zones_left_right = [(1, slice(None), slice(0, u_left_bev)), (2, slice(None), slice(u_right_bev, bev_size))]
+    zones = zones_front_rear + zones_left_right if overlay_opt == 'lr' else zones_left_right + zones_front_rear
+
+    def render_tile(rows, cols):
+        return [cv2.remap(img, *create_bev_projection_maps_tile(cam, bev_range, bev_size, rows, cols), cv2.INTER_CUBIC)
+                for cam, img in zip(cams, imgs)]
+
+    tiles = [(slice(r, min(r + tile_size, bev_size)), slice(c, min(c + tile_size, bev_size)))
+             for r in range(0, bev_size, tile_size) for c in range(0, bev_size, tile_size)]
+
+    if overlay_opt == 'all':
+        # The average is normalized by its maximum over the whole image, so the sums go to a temporary file first
+        with tempfile.TemporaryFile() as tmp_file:
+            bev_sum = np.memmap(tmp_file, dtype=np.uint16, mode='w+', shape=bev_img_all.shape)
+            bev_max = np.float32(0)
+            for rows, cols in tiles:
+                bev_tiles = render_tile(rows, cols)
+                bev_sum[rows, cols] = sum(bev_tile.astype(np.uint16) for bev_tile in bev_tiles)
+                bev_max = max(bev_max, bev_sum[rows, cols].max().astype(np.float32) / 4)
+            for rows, cols in tiles:
+                bev_tile = bev_sum[rows, cols].astype(np.float32) / 4
+                bev_img_all[rows, cols] = ((bev_tile / bev_max) * 255).astype(np.uint8)
+            del bev_sum
+        return bev_img_all
+
+    for rows, cols in tiles:
+        bev_tiles = render_tile(rows, cols)
+        bev_img_tile = np.zeros(bev_tiles[0].shape, dtype=np.uint8)
+        for cam_idx, zone_rows, zone_cols in zones:
+            # Intersection of the zone with the tile, with numpy's slicing rules for the zone bounds
+            row_start, row_stop, _ = zone_rows.indices(bev_size)
+            col_start, col_stop, _ = zone_cols.indices(bev_size)
+            row_start, row_stop = max(row_start, rows.start), min(row_stop, rows.stop)
+            col_start, col_stop = max(col_start, cols.start), min(col_stop, cols.stop)
+            if row_start < row_stop and col_start < col_stop:
+                tile_rows = slice(row_start - rows.start, row_stop - rows.start)
+                tile_cols = slice(col_start - cols.start, col_stop - cols.start)
+                bev_img_tile[tile_rows, tile_cols] = bev_tiles[cam_idx][tile_rows, tile_cols]
+        bev_img_all[rows, cols] = bev_img_tile
+    return bev_img_all
+
+
+class BackgroundBevRenderer(object):
+    """
+    Renders BEV images with generate_bev_all_cams on a background thread, always from the latest submitted request:
+    requests superseded before their rendering starts are dropped. Each request first yields a quick low-resolution
+    preview, then the full-resolution image unless a newer request arrived in between. A request that fails to render
+    is reported and dropped.
+    """
+    def __init__(self, preview_size=160, num_workers=1):
+        self.preview_size = preview_size
+        self.num_workers = num_workers
+        self._cond = threading.Condition()
+        self._request = None
+        self._request_id = 0
+        self._result = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, cams, imgs, overlay_opt='all', bev_range=25, bev_size=640):
+        """
+        :param cams: cameras in front, left, right, rear order
+        :param imgs: images in the same order. They are used from the rendering thread, so they must not be modified
+                     after submission.
+        :return: id of the request
+        """
+        with self._cond:
+            self._request_id += 1
+            self._request = (self._request_id, list(cams), list(imgs), overlay_opt, bev_range, bev_size)
+            self._cond.notify()
+            return self._request_id
+
+    def pop_result(self):
+        """
+        Returns the newest rendered (request_id, bev_img, is_preview) not returned yet, or None. Meant to be polled
+        from the GUI thread.
+        """
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _is_superseded(self, request_id):
+        with self._cond:
+            return self._closed or request_id != self._request_id
+
+    def _publish(self, request_id, bev_img, is_preview):
+        with self._cond:
+            if request_id == self._request_id:
+                self._result = (request_id, bev_img, is_preview)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request_id, cams, imgs, overlay_opt, bev_range, bev_size = self._request
+                self._request = None
+
+            try:
+                if self.preview_size < bev_size:
+                    preview = generate_bev_all_cams(*cams, *imgs, overlay_opt, bev_range, self.preview_size)
+                    self._publish(request_id, preview, True)
+                    if self._is_superseded(request_id):
+                        continue
+                bev_img = generate_bev_all_cams(*cams, *imgs, overlay_opt, bev_range, bev_size, self.num_workers)
+                self._publish(request_id, bev_img, False)
+            except Exception as e:
+                # e.g. a camera moved outside the BEV image: this request is dropped, the next ones are still served
+                print(f"Failed to render BEV request {request_id}: {type(e).__name__}: {e}")
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        # Editors may replace a file by deleting it first
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class BevWatcher(object):
+    """
+    Keeps the BEV image of a set of calibration and image files up to date. poll() checks the files' modification
+    times and only recomputes what changed: a camera whose intrinsics or extrinsics changed gets new maps and a new BEV
+    layer, a camera whose image changed only a new layer, and the composite is then redone from the cached layers.
+    Saves that do not change a camera's parameters (e.g. formatting) recompute nothing.
+    """
+    def __init__(self, calib_files, image_files, overlay_opt='all', bev_range=25, bev_size=640):
+        """
+        :param calib_files, image_files: files of the cameras in front, left, right, rear order
+        """
+        assert overlay_opt in ['fr', 'lr', 'all']
+        self.calib_files = list(calib_files)
+        self.image_files = list(image_files)
+        self.overlay_opt = overlay_opt
+        self.bev_range = bev_range
+        self.bev_size = bev_size
+        self.bev_img = None
+        num_cams = len(self.calib_files)
+        self._calib_states = [None] * num_cams
+        self._calib_params = [None] * num_cams
+        self._image_states = [None] * num_cams
+        self._cams = [None] * num_cams
+        self._imgs = [None] * num_cams
+        self._maps = [None] * num_cams
+        self._layers = [None] * num_cams
+
+    def poll(self):
+        """
+        :return: indices of the cameras whose BEV layer was recomputed, empty if the BEV image is unchanged
+        """
+        changed = []
+        for cam_idx in range(len(self.calib_files)):
+            maps_changed = self._poll_calib(cam_idx)
+            image_changed = self._poll_image(cam_idx)
+            if (maps_changed or image_changed) and self._cams[cam_idx] is not None and self._imgs[cam_idx] is not None:
+                self._layers[cam_idx] = cv2.remap(self._imgs[cam_idx], *self._maps[cam_idx], cv2.INTER_CUBIC)
+                changed.append(cam_idx)
+        if changed and all(layer is not None for layer in self._layers):
+            self.bev_img = overlay_bev_imgs(self._layers, [cam.get_translation()[:2] for cam in self._cams],
+                                            self.overlay_opt, self.bev_range, self.bev_size)
+        return changed
+
+    def _poll_calib(self, cam_idx):
+        path = self.calib_files[cam_idx]
+        state = _file_state(path)
+        if state is None or state == self._calib_states[cam_idx]:
+            return False
+        try:
+            with open(path) as f:
+                config = json.load(f)
+            params = {"intrinsic": config["intrinsic"], "extrinsic": config["extrinsic"]}
+            cam = cam_from_config(config) if params != self._calib_params[cam_idx] else None
+        except (ValueError, KeyError):
+            # Partially written file, it is read again at the next poll
+            return False
+        self._calib_states[cam_idx] = state
+        if cam is None:
+            return False
+        self._calib_params[cam_idx] = params
+        self._cams[cam_idx] = cam
+        self._maps[cam_idx] = create_bev_projection_maps(cam, self.bev_range, self.bev_size)
+        return True
+
+    def _poll_image(self, cam_idx):
+        path = self.image_files[cam_idx]
+        state = _file_state(path)
+        if state is None or state == self._image_states[cam_idx]:
+            return False
+        img = cv2.imread(path)
+        if img is None:
+            return False
+        self._image_states[cam_idx] = state
+        old_img = self._imgs[cam_idx]
+        self._imgs[cam_idx] = img
+        return old_img is None or not np.array_equal(old_img, img)
+
+
+def watch(calib_files, image_files, overlay_opt='all', bev_range=25, bev_size=640, output=None, poll_interval=0.2):
+    """
+    Runs a BevWatcher until interrupted. The BEV image is written to output after each refresh, or shown in a window
+    if output is None.
+    """
+    watcher = BevWatcher(calib_files, image_files, overlay_opt, bev_range, bev_size)
+
+    def refresh():
+        start = time.perf_counter()
+        changed = watcher.poll()
+        if changed and watcher.bev_img is not None:
+            names = ", ".join(os.path.basename(calib_files[cam_idx]) for cam_idx in changed)
+            print(f"Refreshed {names} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return True
+        return False
+
+    if output is None:
+        from matplotlib import pyplot as plt
+        fig, ax = plt.subplots()
+        ax.axis('off')
+        im = None
+
+        def show_refreshed():
+            nonlocal im
+            if refresh():
+                bev_img_rgb = cv2.cvtColor(watcher.bev_img, cv2.COLOR_BGR2RGB)
+                # Nothing is shown until all the cameras have a calibration and an image
+                if im is None:
+                    im = ax.imshow(bev_img_rgb)
+                else:
+                    im.set_data(bev_img_rgb)
+                fig.canvas.draw_idle()
+
+        show_refreshed()
+        if im is None:
+            print("Waiting for all calibration and image files to be readable")
+        timer = fig.canvas.new_timer(interval=int(poll_interval * 1000))
+        timer.add_callback(show_refreshed)
+        timer.start()
+        plt.show()
+        return
+
+    try:
+        while True:
+            if refresh():
+                # Write then rename so that image viewers never load a partial file
+                tmp_output = f"{output}.tmp{os.path.splitext(output)[1]}"
+                cv2.imwrite(tmp_output, watcher.bev_img)
+                os.replace(tmp_output, output)
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    from .utils import example_calib_files, example_image_files
+
+    parser = argparse.ArgumentParser(description="Generate a BEV image from the 4 fisheye images of a surround-view "
+                                                 "system and show it.")
+    parser.add_argument("--calibs", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_calib_files("optimized"), help="calibration json files")
+    parser.add_argument("--images", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_image_files(), help="fisheye images")
+    parser.add_argument("--bev-range", type=float, default=25, help="BEV range in meters")
+    parser.add_argument("--bev-size", type=int, default=960, help="BEV image size in pixels")
+    # Which images to take for overlaying zones, available options: fr: front & rear, lr: left & right, all: all 4 cams
+    parser.add_argument("--overlay", choices=["fr", "lr", "all"], default="all")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="save the BEV image to this file instead of showing it")
+    parser.add_argument("--tile-size", type=int,
+                        help="render out-of-core tile by tile into --output, which must be a .npy file (memory-mapped)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and refresh the BEV image whenever the calibration or image files change")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="seconds between file checks with --watch")
+    args = parser.parse_args(argv)
+    if args.tile_size is not None and not (args.output or "").endswith(".npy"):
+        parser.error("--tile-size requires a .npy --output")
+    if args.watch and args.tile_size is not None:
+        parser.error("--watch cannot be combined with --tile-size")
+    if args.watch:
+        watch(args.calibs, args.images, args.overlay, args.bev_range, args.bev_size, args.output, args.poll_interval)
+        return
+
+    cams = [read_cam_from_json(calib_f) for calib_f in args.calibs]
+    fisheye_imgs = [cv2.imread(img_f) for img_f in args.images]
+    if args.tile_size is not None:
+        bev_img_all = np.lib.format.open_memmap(args.output, mode='w+', dtype=np.uint8,
+                                                shape=(args.bev_size, args.bev_size, 3))
+        generate_bev_all_cams_tiled(*cams, *fisheye_imgs, bev_img_all, args.overlay, args.bev_range, args.tile_size)
+        bev_img_all.flush()
+        return
+    bev_img_all = generate_bev_all_cams(*cams, *fisheye_imgs, args.overlay, args.bev_range, args.bev_size,
+                                        args.num_workers)
+    if args.output:
+        cv2.imwrite(args.output, bev_img_all)
+    else:
+        from matplotlib import pyplot as plt
+        plt.imshow(cv2.cvtColor(bev_img_all, cv2.COLOR_BGR2RGB))
+        plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -20,16 +20,15 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import matplotlib.pyplot as plt
-from matplotlib.widgets import TextBox, RadioButtons, Button
+import argparse
 import os
 from scipy.spatial.transform import Rotation as SciRot
 import cv2
-from utils import init_fisheye_cam, read_calib, write_calib
-from generate_bev_img import generate_bev_all_cams
+from .utils import init_fisheye_cam, read_calib, write_calib, example_calib_files, example_image_files, EXAMPLE_DATA_DIR
+from .generate_bev_img import generate_bev_all_cams, BackgroundBevRenderer
 
 
-if __name__ == '__main__':
+def main(argv=None):
     """
     How to use:
     Adjust the extrinsic parameters, especially rotation angles, for each camera to create a reasonably good BEV image. 
@@ -37,17 +36,23 @@ if __name__ == '__main__':
     Once finished, click 'Export to files' button to save calibrations to files. Then you can use the saved calibrations
     as the initial files for optimize.py.
     """
-    ini_calib_dir = "../calibrations/fisheye/creteil_learning_car_manual_calib_ini"
+    parser = argparse.ArgumentParser(description="Manually adjust the initial extrinsic calibration of a "
+                                                 "surround-view system.")
     # Original calibrations are used only to get intrinsics and camera heights
-    calib_ori_f_front = "../calibrations/original/00164_FV.json"
-    calib_ori_f_left = "../calibrations/original/00165_MVL.json"
-    calib_ori_f_right = "../calibrations/original/00166_MVR.json"
-    calib_ori_f_rear = "../calibrations/original/00167_RV.json"
-    img_front = cv2.imread("../images/fisheye/00164_FV.png")
-    img_left = cv2.imread("../images/fisheye/00165_MVL.png")
-    img_right = cv2.imread("../images/fisheye/00166_MVR.png")
-    img_rear = cv2.imread("../images/fisheye/00167_RV.png")
-    calib_export_dir = "../calibrations/initial"
+    parser.add_argument("--calibs", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_calib_files("original"), help="calibration json files with the intrinsics")
+    parser.add_argument("--images", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_image_files(), help="fisheye images")
+    parser.add_argument("--export-dir", default=os.path.join(EXAMPLE_DATA_DIR, "calibrations", "initial"),
+                        help="directory to export the calibrations to, with the same file names as --calibs")
+    args = parser.parse_args(argv)
+
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import TextBox, RadioButtons, Button
+
+    calib_ori_f_front, calib_ori_f_left, calib_ori_f_right, calib_ori_f_rear = args.calibs
+    img_front, img_left, img_right, img_rear = [cv2.imread(img_f) for img_f in args.images]
+    calib_export_dir = args.export_dir
     overlay_opt = 'lr'
 
     if not os.path.exists(calib_export_dir):
@@ -93,7 +98,22 @@ if __name__ == '__main__':
     topview = generate_bev_all_cams(cam_front, cam_left, cam_right, cam_rear, img_front, img_left, img_right, img_rear, overlay_opt)
     im = ax.imshow(cv2.cvtColor(topview, cv2.COLOR_BGR2RGB))
 
+    # Rendering runs in the background so that the GUI stays responsive: stale edits are dropped, and a low-resolution
+    # preview is shown before the full-resolution BEV
+    renderer = BackgroundBevRenderer(num_workers=os.cpu_count())
+
+    def show_rendered():
+        result = renderer.pop_result()
+        if result is not None:
+            im.set_data(cv2.cvtColor(result[1], cv2.COLOR_BGR2RGB))
+            fig.canvas.draw_idle()
+
+    timer = fig.canvas.new_timer(interval=30)
+    timer.add_callback(show_rendered)
+    timer.start()
+
     def update_calib(val):
+        nonlocal cam_front, cam_left, cam_right, cam_rear
         overlay_opt = 'lr' if menu_topview_opt.value_selected == 'left-right' else 'fr'
         pos_x_0 = float(text_pos_x_0.text)
         pos_y_0 = float(text_pos_y_0.text)
@@ -118,32 +138,32 @@ if __name__ == '__main__':
         t_front[0] = pos_x_0
         t_front[1] = pos_y_0
         R_front = SciRot.from_euler('zxz', [rot_z1_0, rot_x_0, rot_z2_0], degrees=True).as_matrix()
-        cam_front.update_extr(t_front, R_front)
+        cam_front = cam_front.with_extr(t_front, R_front)
         t_left[0] = pos_x_1
         t_left[1] = pos_y_1
         R_left = SciRot.from_euler('zxz', [rot_z1_1, rot_x_1, rot_z2_1], degrees=True).as_matrix()
-        cam_left.update_extr(t_left, R_left)
+        cam_left = cam_left.with_extr(t_left, R_left)
         t_right[0] = pos_x_2
         t_right[1] = pos_y_2
         R_right = SciRot.from_euler('zxz', [rot_z1_2, rot_x_2, rot_z2_2], degrees=True).as_matrix()
-        cam_right.update_extr(t_right, R_right)
+        cam_right = cam_right.with_extr(t_right, R_right)
         t_rear[0] = pos_x_3
         t_rear[1] = pos_y_3
         R_rear = SciRot.from_euler('zxz', [rot_z1_3, rot_x_3, rot_z2_3], degrees=True).as_matrix()
-        cam_rear.update_extr(t_rear, R_rear)
-        topview = generate_bev_all_cams(cam_front, cam_left, cam_right, cam_rear, img_front, img_left, img_right, img_rear, overlay_opt)
-        im.set_data(cv2.cvtColor(topview, cv2.COLOR_BGR2RGB))
-        fig.canvas.draw_idle()
+        cam_rear = cam_rear.with_extr(t_rear, R_rear)
+        # Cameras are immutable, the renderer can keep them while the next edits create new ones
+        renderer.submit([cam_front, cam_left, cam_right, cam_rear],
+                        [img_front, img_left, img_right, img_rear], overlay_opt)
 
     def export_calib(event):
         quat_front = SciRot.from_matrix(cam_front.get_rotation()).as_quat().tolist()
         quat_left = SciRot.from_matrix(cam_left.get_rotation()).as_quat().tolist()
         quat_right = SciRot.from_matrix(cam_right.get_rotation()).as_quat().tolist()
         quat_rear = SciRot.from_matrix(cam_rear.get_rotation()).as_quat().tolist()
-        write_calib(intr_front, quat_front, t_front, os.path.join(calib_export_dir, "00164_FV.json"))
-        write_calib(intr_left, quat_left, t_left, os.path.join(calib_export_dir, "00165_MVL.json"))
-        write_calib(intr_right, quat_right, t_right, os.path.join(calib_export_dir, "00166_MVR.json"))
-        write_calib(intr_rear, quat_rear, t_rear, os.path.join(calib_export_dir, "00167_RV.json"))
+        write_calib(intr_front, quat_front, t_front, os.path.join(calib_export_dir, os.path.basename(calib_ori_f_front)))
+        write_calib(intr_left, quat_left, t_left, os.path.join(calib_export_dir, os.path.basename(calib_ori_f_left)))
+        write_calib(intr_right, quat_right, t_right, os.path.join(calib_export_dir, os.path.basename(calib_ori_f_right)))
+        write_calib(intr_rear, quat_rear, t_rear, os.path.join(calib_export_dir, os.path.basename(calib_ori_f_rear)))
 
     box_topview_opt = plt.axes([0.10, 0.7, 0.1, 0.1], facecolor='linen')
     menu_topview_opt = RadioButtons(box_topview_opt, ('left-right', 'front-rear'))
@@ -222,3 +242,9 @@ if __name__ == '__main__':
     text_rot_z2_3.on_submit(update_calib)
 
     plt.show()
+    timer.stop()
+    renderer.close()
+
+
+if __name__ == '__main__':
+    main()
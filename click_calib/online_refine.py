@@ -0,0 +1,185 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import argparse
+import os
+import time
+from collections import namedtuple
+import numpy as np
+from scipy.optimize import minimize
+from scipy.stats import ttest_rel
+from .utils import (quat_to_mat, mat_to_quat, rotvec_to_mat, init_fisheye_cam, read_calib, write_calib, read_points,
+                    CAM_PAIRS, CAM_NAMES)
+
+WindowUpdate = namedtuple("WindowUpdate", ["accepted", "mde_before", "mde_after", "p_value", "num_iter", "elapsed"])
+
+
+class _TimeBudgetExceeded(Exception):
+    pass
+
+
+def calc_point_dist_errors(calib, cams, pos_zs, rots_ini, pts_pairs):
+    """
+    Distance in meters between the ground projections of each pair of matching keypoints.
+
+    :param calib: [pos_x, pos_y, *rotvec] for each camera, same layout as in optimize.py
+    :param cams: cameras in CAM_NAMES order, only their intrinsics are used
+    :param pos_zs: fixed camera heights in CAM_NAMES order
+    :param rots_ini: rotation matrices the rotation vectors are relative to, in CAM_NAMES order
+    :param pts_pairs: keypoints of each pair in CAM_PAIRS order, see utils.read_points
+    """
+    cams = [cam.with_extr([calib[5 * i], calib[5 * i + 1], pos_z], rotvec_to_mat(calib[5 * i + 2:5 * i + 5], rot_ini))
+            for i, (cam, pos_z, rot_ini) in enumerate(zip(cams, pos_zs, rots_ini))]
+
+    dists = []
+    for (cam_a, cam_b), pair in zip(CAM_PAIRS, pts_pairs):
+        assert len(pair[cam_a]) == len(pair[cam_b])
+        if len(pair[cam_a]) > 0:
+            pts_world_a = cams[CAM_NAMES.index(cam_a)].project_2d_to_3d_ground(pair[cam_a])
+            pts_world_b = cams[CAM_NAMES.index(cam_b)].project_2d_to_3d_ground(pair[cam_b])
+            dists.append(np.linalg.norm(pts_world_a - pts_world_b, axis=1))
+    return np.concatenate(dists) if dists else np.zeros(0)
+
+
+def split_window(pts_pairs):
+    """
+    Splits the keypoints of a window into a fit and a test half, alternating the points of each pair.
+
+    :return: fit and test keypoints, both in the format of utils.read_points
+    """
+    fit_pairs, test_pairs = [], []
+    for pair in pts_pairs:
+        fit_pairs.append({cam: np.reshape(pts, (-1, 2))[0::2] for cam, pts in pair.items()})
+        test_pairs.append({cam: np.reshape(pts, (-1, 2))[1::2] for cam, pts in pair.items()})
+    return fit_pairs, test_pairs
+
+
+class OnlineRefiner(object):
+    """
+    Refines the extrinsics of a surround-view system from successive windows of new keypoints. Each window is split in
+    two halves (see split_window): a few BFGS iterations warm-started from the current extrinsics are run on the fit
+    half, and the result is only accepted when its per-point distance errors on the held-out test half are
+    significantly lower than the current ones (one-sided paired t-test). Testing on points the solver has not seen
+    keeps the test from favoring updates that only fit the noise of the window.
+    """
+    def __init__(self, intrs, quats, ts, max_iter=5, time_budget=None, alpha=0.01, min_improvement=0.0):
+        """
+        :param max_iter: maximum number of BFGS iterations per window
+        :param time_budget: maximum solver time per window in seconds, None for no limit
+        :param alpha: significance level of the test
+        :param min_improvement: minimum decrease of the mean distance error (in meters) to accept an update
+        """
+        self.intrs = intrs
+        self.pos_zs = [t[2] for t in ts]
+        self.cams = [init_fisheye_cam(intr, quat, t) for intr, quat, t in zip(intrs, quats, ts)]
+        self.xys = np.array([[t[0], t[1]] for t in ts], dtype=float)
+        self.rotations = [quat_to_mat(quat) for quat in quats]
+        self.max_iter = max_iter
+        self.time_budget = time_budget
+        self.alpha = alpha
+        self.min_improvement = min_improvement
+
+    @property
+    def quats(self):
+        return [mat_to_quat(rotation).tolist() for rotation in self.rotations]
+
+    @property
+    def ts(self):
+        return [[xy[0], xy[1], pos_z] for xy, pos_z in zip(self.xys.tolist(), self.pos_zs)]
+
+    def update(self, pts_pairs) -> WindowUpdate:
+        """
+        :return: WindowUpdate, whose mean distance errors are those of the test half
+        """
+        start = time.perf_counter()
+        fit_pairs, test_pairs = split_window(pts_pairs)
+        # Warm start: current positions, and rotation vectors relative to the current rotations
+        calib_cur = np.hstack((self.xys, np.zeros((len(CAM_NAMES), 3)))).ravel()
+        best = {"calib": calib_cur, "mde": np.inf}
+
+        def func_optimize(calib):
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                raise _TimeBudgetExceeded()
+            mde = calc_point_dist_errors(calib, self.cams, self.pos_zs, self.rotations, fit_pairs).mean()
+            if mde < best["mde"]:
+                best["calib"], best["mde"] = calib.copy(), mde
+            return mde
+
+        try:
+            res = minimize(func_optimize, calib_cur, method='BFGS', options={'maxiter': self.max_iter})
+            num_iter = res.nit
+        except _TimeBudgetExceeded:
+            num_iter = -1
+        calib_new = best["calib"]
+
+        errors_before = calc_point_dist_errors(calib_cur, self.cams, self.pos_zs, self.rotations, test_pairs)
+        errors_after = calc_point_dist_errors(calib_new, self.cams, self.pos_zs, self.rotations, test_pairs)
+        mde_before, mde_after = errors_before.mean(), errors_after.mean()
+        p_value = 1.0
+        if errors_before.size > 1 and np.any(errors_before != errors_after):
+            p_value = ttest_rel(errors_before, errors_after, alternative='greater').pvalue
+        accepted = bool(p_value < self.alpha and mde_before - mde_after > self.min_improvement)
+        if accepted:
+            calib_new = calib_new.reshape(len(CAM_NAMES), 5)
+            self.xys = calib_new[:, 0:2].copy()
+            self.rotations = [rotvec_to_mat(rotvec, rotation) for rotvec, rotation in zip(calib_new[:, 2:5],
+                                                                                         self.rotations)]
+        return WindowUpdate(accepted, mde_before, mde_after, p_value, num_iter, time.perf_counter() - start)
+
+    def write_calibs(self, calib_files):
+        for intr, quat, t, calib_file in zip(self.intrs, self.quats, self.ts, calib_files):
+            write_calib(intr, quat, t, calib_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refine the extrinsic calibration of a surround-view system online "
+                                                 "from successive windows of keypoints.")
+    parser.add_argument("--calibs", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"), required=True,
+                        help="current calibration json files")
+    parser.add_argument("--windows", nargs="+", required=True,
+                        help="keypoints json files, one per time window, processed in this order")
+    parser.add_argument("--save-dir", required=True,
+                        help="directory the calibrations are written to whenever an update is accepted")
+    parser.add_argument("--max-iter", type=int, default=5, help="maximum number of solver iterations per window")
+    parser.add_argument("--time-budget", type=float, help="maximum solver time per window in seconds")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level to accept an update")
+    parser.add_argument("--min-improvement", type=float, default=0.0,
+                        help="minimum decrease of the mean distance error in meters to accept an update")
+    args = parser.parse_args(argv)
+
+    intrs, quats, ts = zip(*[read_calib(calib_f) for calib_f in args.calibs])
+    refiner = OnlineRefiner(intrs, quats, ts, args.max_iter, args.time_budget, args.alpha, args.min_improvement)
+    save_files = [os.path.join(args.save_dir, os.path.basename(calib_f)) for calib_f in args.calibs]
+    os.makedirs(args.save_dir, exist_ok=True)
+
+    for window_f in args.windows:
+        update = refiner.update(read_points(window_f))
+        print(f"{window_f}: held-out MDE {update.mde_before:.4f} -> {update.mde_after:.4f}, "
+              f"p-value {update.p_value:.3g}, {update.elapsed * 1000:.0f} ms, "
+              f"{'accepted' if update.accepted else 'rejected'}")
+        if update.accepted:
+            refiner.write_calibs(save_files)
+
+
+if __name__ == '__main__':
+    main()
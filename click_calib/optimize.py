@@ -0,0 +1,220 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+from scipy.optimize import minimize
+from .projection import create_lens
+from .utils import (quat_to_mat, mat_to_quat, rotvec_to_mat, init_fisheye_cam, read_calib, write_calib, read_points,
+                    example_calib_files, example_points_file, EXAMPLE_DATA_DIR, CAM_NAMES, CAM_PAIRS)
+from .result_cache import ResultCache
+
+# Everything besides the initial calibrations and the keypoints that changes the optimization result, used to key the
+# result cache. Bump "parametrization" whenever the layout of the optimized vector changes.
+SOLVER_CONFIG = {"method": "BFGS", "options": {}, "parametrization": "xy_rotvec"}
+
+
+class BlockEvaluator(object):
+    """
+    Mean distance error of the keypoints, i.e. mean distance between the ground projections of matching keypoints,
+    evaluated camera by camera: calib is made of one block of parameters per camera, and the ground projections of
+    each camera's keypoints are cached by block value. A finite-difference probe only changes one block, so only that
+    camera is projected again.
+
+    A block is [pos_x, pos_y, *rotvec], with rotvec relative to the initial rotation, followed with refine_intrinsics
+    by [dk1, dk2, dk3, dk4, dcx_offset, dcy_offset]: the relative changes of the distortion coefficients and the
+    principal point offset changes in pixels. Only the radial_poly and kannala_brandt lens models have these
+    coefficients. The intrinsics have a quadratic prior towards their initial values, with standard deviations
+    K_SIGMA (relative) and PP_SIGMA (pixels): the keypoints alone do not constrain them.
+    """
+    EXTR_SIZE = 5
+    INTR_SIZE = 6
+    K_SIGMA = 0.01
+    PP_SIGMA = 2.0
+
+    def __init__(self, intrs, quats, ts, pts_pairs, refine_intrinsics=False, intrinsic_prior_weight=1e-2,
+                 cache_size=16, verbose=True):
+        """
+        :param intrs, quats, ts: initial calibration of each camera in CAM_NAMES order, see utils.read_calib
+        :param pts_pairs: keypoints of each pair in CAM_PAIRS order, see utils.read_points
+        :param intrinsic_prior_weight: cost in meters of a change of one standard deviation of an intrinsic parameter
+        :param cache_size: number of cached projections per camera, must exceed the block size to keep the unchanged
+                           cameras cached during a gradient
+        """
+        self.intrs = intrs
+        self.ts = ts
+        self.rots_ini = [quat_to_mat(quat) for quat in quats]
+        self.cams = [init_fisheye_cam(intr, quat, t) for intr, quat, t in zip(intrs, quats, ts)]
+        assert not refine_intrinsics or all("k4" in intr for intr in intrs), \
+            "refine_intrinsics needs lens models with distortion coefficients k1-k4"
+        self.refine_intrinsics = refine_intrinsics
+        self.intrinsic_prior_weight = intrinsic_prior_weight
+        self.block_size = self.EXTR_SIZE + (self.INTR_SIZE if refine_intrinsics else 0)
+        self.cache_size = cache_size
+        self.verbose = verbose
+
+        # All keypoints of each camera are projected in a single call, pair_slices tell where each pair's are
+        self.cam_pts = [[] for _ in CAM_NAMES]
+        self.pair_slices = []
+        for (cam_a, cam_b), pair in zip(CAM_PAIRS, pts_pairs):
+            assert len(pair[cam_a]) == len(pair[cam_b]) and len(pair[cam_a]) > 0
+            slices = []
+            for cam in (cam_a, cam_b):
+                cam_idx = CAM_NAMES.index(cam)
+                start = sum(len(pts) for pts in self.cam_pts[cam_idx])
+                self.cam_pts[cam_idx].append(np.asarray(pair[cam], dtype=float))
+                slices.append((cam_idx, slice(start, start + len(pair[cam]))))
+            self.pair_slices.append(slices)
+        self.cam_pts = [np.concatenate(pts) if pts else np.zeros((0, 2)) for pts in self.cam_pts]
+        self.num_pts = sum(len(pair[cam_a]) for (cam_a, _), pair in zip(CAM_PAIRS, pts_pairs))
+        self._caches = [OrderedDict() for _ in CAM_NAMES]
+
+    def calib_ini(self):
+        return np.concatenate([[t[0], t[1]] + [0] * (self.block_size - 2) for t in self.ts]).astype(float)
+
+    def calib_to_calibs(self, calib):
+        """
+        Converts an optimized vector to (intrinsic, quaternion, translation) of each camera.
+        """
+        calibs = []
+        for i, block in enumerate(np.reshape(calib, (len(CAM_NAMES), self.block_size))):
+            intr = dict(self.intrs[i])
+            if self.refine_intrinsics:
+                intr.update(self._intrinsic_update(i, block))
+            quat = mat_to_quat(rotvec_to_mat(block[2:5], self.rots_ini[i])).tolist()
+            calibs.append((intr, quat, [block[0], block[1], self.ts[i][2]]))
+        return calibs
+
+    def _intrinsic_update(self, cam_idx, block):
+        intr = self.intrs[cam_idx]
+        dk = block[self.EXTR_SIZE:self.EXTR_SIZE + 4]
+        update = {f"k{j + 1}": intr[f"k{j + 1}"] * (1 + dk[j]) for j in range(4)}
+        update["cx_offset"] = intr["cx_offset"] + block[self.EXTR_SIZE + 4]
+        update["cy_offset"] = intr["cy_offset"] + block[self.EXTR_SIZE + 5]
+        return update
+
+    def _project_cam(self, cam_idx, block):
+        key = block.tobytes()
+        cache = self._caches[cam_idx]
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        cam = self.cams[cam_idx]
+        if self.refine_intrinsics:
+            intr = self._intrinsic_update(cam_idx, block)
+            lens = create_lens(dict(self.intrs[cam_idx], **intr))
+            cam = cam.with_intr(lens, (intr["cx_offset"], intr["cy_offset"]))
+        cam = cam.with_extr([block[0], block[1], self.ts[cam_idx][2]], rotvec_to_mat(block[2:5], self.rots_ini[cam_idx]))
+        pts_world = cam.project_2d_to_3d_ground(self.cam_pts[cam_idx])
+
+        cache[key] = pts_world
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return pts_world
+
+    def __call__(self, calib):
+        blocks = np.reshape(calib, (len(CAM_NAMES), self.block_size))
+        pts_world = [self._project_cam(i, block) for i, block in enumerate(blocks)]
+        distance = 0
+        for (cam_idx_a, slice_a), (cam_idx_b, slice_b) in self.pair_slices:
+            distance += np.linalg.norm(pts_world[cam_idx_a][slice_a] - pts_world[cam_idx_b][slice_b], axis=1).sum()
+        mde = distance / self.num_pts
+        if self.verbose:
+            print(f"Mean distance error: {mde}")
+        if self.refine_intrinsics:
+            return mde + self.intrinsic_prior(calib)
+        return mde
+
+    def intrinsic_prior(self, calib):
+        blocks = np.reshape(calib, (len(CAM_NAMES), self.block_size))
+        dk = blocks[:, self.EXTR_SIZE:self.EXTR_SIZE + 4] / self.K_SIGMA
+        dc = blocks[:, self.EXTR_SIZE + 4:self.EXTR_SIZE + 6] / self.PP_SIGMA
+        return self.intrinsic_prior_weight * (np.sum(dk ** 2) + np.sum(dc ** 2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize the extrinsic calibration of a surround-view system from "
+                                                 "keypoints clicked in adjacent cameras.")
+    parser.add_argument("--calibs", nargs=4, metavar=("FRONT", "LEFT", "RIGHT", "REAR"),
+                        default=example_calib_files("original"), help="initial calibration json files")
+    # Put your clicked keypoints in this file, see click_points.py
+    parser.add_argument("--points", default=example_points_file(), help="clicked keypoints json file")
+    parser.add_argument("--save-dir", default=os.path.join(EXAMPLE_DATA_DIR, "calibrations", "optimized"),
+                        help="directory to write the optimized calibrations to, with the same file names")
+    parser.add_argument("--refine-intrinsics", action="store_true",
+                        help="also refine the distortion coefficients k1-k4 and the principal point of each camera")
+    parser.add_argument("--intrinsic-prior-weight", type=float, default=1e-2,
+                        help="with --refine-intrinsics, cost in meters of a 1%% change of a distortion coefficient or a "
+                             "2 px change of the principal point")
+    parser.add_argument("--cache-dir", help="result cache directory: identical runs are not optimized again, and "
+                                            "runs with only a few different keypoints are warm-started")
+    parser.add_argument("--cache-max-changed", type=int, default=5,
+                        help="maximum number of changed keypoints to warm-start from a cached run")
+    args = parser.parse_args(argv)
+
+    pts_pairs = read_points(args.points)
+    intrs, quats, ts = zip(*[read_calib(calib_f) for calib_f in args.calibs])
+    solver_config = dict(SOLVER_CONFIG, refine_intrinsics=args.refine_intrinsics)
+    if args.refine_intrinsics:
+        solver_config["intrinsic_prior_weight"] = args.intrinsic_prior_weight
+
+    func_optimize = BlockEvaluator(intrs, quats, ts, pts_pairs, args.refine_intrinsics, args.intrinsic_prior_weight)
+    calib_ini = func_optimize.calib_ini()
+
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    cached_result = None
+    if cache is not None:
+        cache_inputs = ResultCache.make_inputs(list(zip(intrs, quats, ts)), pts_pairs, solver_config)
+        cached_result = cache.get(cache_inputs)
+        if cached_result is None:
+            warm_start = cache.nearest(cache_inputs, args.cache_max_changed)
+            if warm_start is not None:
+                print("Warm start from a cached run with similar keypoints")
+                calib_ini = np.array(warm_start["calib"])
+
+    if cached_result is not None:
+        print("Result found in cache")
+        final_calib = cached_result["calib"]
+        print("Optimized mean distance error:", cached_result["fun"])
+    else:
+        start = time.perf_counter()
+        res_multi_cam = minimize(func_optimize, calib_ini, method=solver_config["method"],
+                                 options=solver_config["options"])
+        final_calib = res_multi_cam.x.tolist()
+        print("Optimized mean distance error:", res_multi_cam.fun)
+        if cache is not None:
+            cache.put(cache_inputs, {"calib": final_calib, "fun": float(res_multi_cam.fun),
+                                     "nit": int(res_multi_cam.nit), "nfev": int(res_multi_cam.nfev),
+                                     "success": bool(res_multi_cam.success), "message": str(res_multi_cam.message),
+                                     "elapsed": time.perf_counter() - start})
+    # Save to files
+    os.makedirs(args.save_dir, exist_ok=True)
+    for (intr, quat, t), calib_f in zip(func_optimize.calib_to_calibs(final_calib), args.calibs):
+        write_calib(intr, quat, t, os.path.join(args.save_dir, os.path.basename(calib_f)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,735 @@
+#!/usr/bin/env python3
+# Copyright 2021 Valeo Schalter und Sensoren GmbH and contributors
+#
+# Author: Christian Witt <christian.witt@valeo.com>
+# Modified 2024 by Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import copy
+import json
+
+import numpy as np
+import cv2
+
+
+def ensure_point_list(points, dim, concatenate=True, crop=True):
+    if isinstance(points, list):
+        points = np.array(points)
+    assert isinstance(points, np.ndarray)
+    assert points.ndim == 2
+
+    if crop:
+        for test_dim in range(4, dim, -1):
+            if points.shape[1] == test_dim:
+                new_shape = test_dim - 1
+                assert np.array_equal(points[:, new_shape], np.ones(points.shape[0]))
+                points = points[:, 0:new_shape]
+
+    if concatenate and points.shape[1] == (dim - 1):
+        points = np.concatenate((np.array(points), np.ones((points.shape[0], 1))), axis=1)
+
+    if points.shape[1] != dim:
+        raise AssertionError('points.shape[1] == dim failed ({} != {})'.format(points.shape[1], dim))
+    return points
+
+
+class Projection(object):
+    def project_3d_to_2d(self, cam_points: np.ndarray, invalid_value=np.nan):
+        raise NotImplementedError()
+
+    def project_2d_to_3d(self, lens_points: np.ndarray, norm: np.ndarray):
+        raise NotImplementedError()
+
+
+class RadialPolyCamProjection(Projection):
+    model = 'radial_poly'
+
+    def __init__(self, distortion_params: list):
+        self.coefficients = np.asarray(distortion_params)
+        self.power = np.array([np.arange(start=1, stop=self.coefficients.size + 1)]).T
+
+    def __reduce__(self):
+        return RadialPolyCamProjection, (self.coefficients.tolist(),)
+
+    def params(self):
+        return self.coefficients
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(list(params))
+
+    @classmethod
+    def from_intrinsic(cls, intrinsic):
+        return cls([intrinsic[f'k{k + 1}'] for k in range(intrinsic.get('poly_order', 4))])
+
+    def to_intrinsic(self):
+        return {'model': self.model, 'poly_order': int(self.coefficients.size),
+                **{f'k{k + 1}': float(c) for k, c in enumerate(self.coefficients)}}
+
+    def project_3d_to_2d(self, cam_points, invalid_value=np.nan):
+        camera_points = ensure_point_list(cam_points, dim=3)
+        chi = np.sqrt(camera_points.T[0] * camera_points.T[0] + camera_points.T[1] * camera_points.T[1])
+        theta = np.pi / 2.0 - np.arctan2(camera_points.T[2], chi)
+        rho = self._theta_to_rho(theta)
+        lens_points = np.divide(rho, chi, where=(chi != 0))[:, np.newaxis] * camera_points[:, 0:2]
+
+        # set (0, 0, 0) = np.nan
+        lens_points[(chi == 0) & (cam_points[:, 2] == 0)] = invalid_value
+        return lens_points
+
+    def project_2d_to_3d(self, lens_points: np.ndarray, norms: np.ndarray):
+        lens_points = ensure_point_list(lens_points, dim=2)
+        norms = ensure_point_list(norms, dim=1).reshape(norms.size)
+
+        rhos = np.linalg.norm(lens_points, axis=1)
+        thetas = self._rho_to_theta(rhos)
+        chis = norms * np.sin(thetas)
+        zs = norms * np.cos(thetas)
+        xy = np.divide(chis, rhos, where=(rhos != 0))[:, np.newaxis] * lens_points
+        xyz = np.hstack((xy, zs[:, np.newaxis]))
+        return xyz
+
+    def _theta_to_rho(self, theta):
+        return np.dot(self.coefficients, np.power(np.array([theta]), self.power))
+
+    def _rho_to_theta(self, rho):
+        coeff = list(reversed(self.coefficients))
+        results = np.zeros_like(rho)
+        for i, _r in enumerate(rho):
+            theta = np.roots([*coeff, -_r])
+            theta = np.real(theta[theta.imag == 0])
+            theta = theta[np.where(np.abs(theta) < np.pi)]
+            theta = np.min(theta) if theta.size > 0 else 0
+            results[i] = theta
+        return results
+
+
+class KannalaBrandtProjection(Projection):
+    """
+    OpenCV fisheye / Kannala-Brandt model: rho = f * theta * (1 + k1 theta^2 + k2 theta^4 + k3 theta^6 + k4 theta^8).
+    The inverse runs vectorized Newton iterations on all points at once.
+    """
+    model = 'kannala_brandt'
+
+    def __init__(self, focal_length: float, distortion_params: list):
+        self.focal_length = float(focal_length)
+        self.coefficients = np.asarray(distortion_params, dtype=float)
+        self.power = np.arange(2, 2 * self.coefficients.size + 1, 2)
+
+    def __reduce__(self):
+        return KannalaBrandtProjection, (self.focal_length, self.coefficients.tolist())
+
+    def params(self):
+        return np.concatenate(([self.focal_length], self.coefficients))
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params[0], list(params[1:]))
+
+    @classmethod
+    def from_intrinsic(cls, intrinsic):
+        return cls(intrinsic['f'], [intrinsic[f'k{k + 1}'] for k in range(4)])
+
+    def to_intrinsic(self):
+        return {'model': self.model, 'f': self.focal_length,
+                **{f'k{k + 1}': float(c) for k, c in enumerate(self.coefficients)}}
+
+    def project_3d_to_2d(self, cam_points, invalid_value=np.nan):
+        camera_points = ensure_point_list(cam_points, dim=3)
+        chi = np.sqrt(camera_points[:, 0] * camera_points[:, 0] + camera_points[:, 1] * camera_points[:, 1])
+        theta = np.arctan2(chi, camera_points[:, 2])
+        rho = self.focal_length * self._distort(theta)
+        lens_points = np.divide(rho, chi, out=np.zeros_like(rho), where=(chi != 0))[:, np.newaxis] * \
+            camera_points[:, 0:2]
+        lens_points[(chi == 0) & (camera_points[:, 2] == 0)] = invalid_value
+        return lens_points
+
+    def project_2d_to_3d(self, lens_points: np.ndarray, norms: np.ndarray):
+        lens_points = ensure_point_list(lens_points, dim=2)
+        norms = ensure_point_list(norms, dim=1).reshape(norms.size)
+
+        rhos = np.linalg.norm(lens_points, axis=1)
+        thetas = self._undistort(rhos / self.focal_length)
+        chis = norms * np.sin(thetas)
+        zs = norms * np.cos(thetas)
+        xy = np.divide(chis, rhos, out=np.zeros_like(chis), where=(rhos != 0))[:, np.newaxis] * lens_points
+        return np.column_stack((xy, zs))
+
+    def _distort(self, theta):
+        return theta * (1 + np.power(theta[:, np.newaxis], self.power) @ self.coefficients)
+
+    def _undistort(self, theta_d, num_iter=20, tol=1e-12):
+        """
+        Newton iterations from theta = theta_d, clamped to [0, pi). Points without a solution in that range, outside
+        of the field of view, are set to nan.
+        """
+        theta = theta_d.copy()
+        for _ in range(num_iter):
+            theta_pow = np.power(theta[:, np.newaxis], self.power)
+            value = theta * (1 + theta_pow @ self.coefficients) - theta_d
+            derivative = 1 + theta_pow @ (self.coefficients * (self.power + 1))
+            step = np.divide(value, derivative, out=np.zeros_like(value), where=(derivative != 0))
+            theta = np.clip(theta - step, 0, np.pi)
+            if np.all(np.abs(step) < tol):
+                break
+        theta[np.abs(self._distort(theta) - theta_d) > 1e-6 * np.maximum(1, theta_d)] = np.nan
+        return theta
+
+
+class DoubleSphereProjection(Projection):
+    """
+    Double sphere model (Usenko et al., 2018), with focal length f and parameters xi and alpha. Its inverse is closed
+    form. alpha = 0 gives the unified camera model.
+    """
+    model = 'double_sphere'
+
+    def __init__(self, focal_length: float, xi: float, alpha: float):
+        assert 0 <= alpha < 1
+        self.focal_length = float(focal_length)
+        self.xi = float(xi)
+        self.alpha = float(alpha)
+
+    @classmethod
+    def from_intrinsic(cls, intrinsic):
+        return cls(intrinsic['f'], intrinsic['xi'], intrinsic['alpha'])
+
+    def to_intrinsic(self):
+        return {'model': self.model, 'f': self.focal_length, 'xi': self.xi, 'alpha': self.alpha}
+
+    def params(self):
+        return np.array([self.focal_length, self.xi, self.alpha])
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(*params)
+
+    def project_3d_to_2d(self, cam_points, invalid_value=np.nan):
+        camera_points = ensure_point_list(cam_points, dim=3)
+        x, y, z = camera_points.T
+        xi, alpha = self.xi, self.alpha
+        d1 = np.sqrt(x * x + y * y + z * z)
+        zs = xi * d1 + z
+        d2 = np.sqrt(x * x + y * y + zs * zs)
+        denominator = alpha * d2 + (1 - alpha) * zs
+        lens_points = self.focal_length * np.divide(camera_points[:, 0:2], denominator[:, np.newaxis],
+                                                    out=np.zeros((len(z), 2)), where=(denominator != 0)[:, np.newaxis])
+
+        # Points behind the field of view boundary do not project
+        w1 = alpha / (1 - alpha) if alpha <= 0.5 else (1 - alpha) / alpha
+        w2 = (w1 + xi) / np.sqrt(2 * w1 * xi + xi * xi + 1)
+        lens_points[(z <= -w2 * d1) | (d1 == 0)] = invalid_value
+        return lens_points
+
+    def project_2d_to_3d(self, lens_points: np.ndarray, norms: np.ndarray):
+        lens_points = ensure_point_list(lens_points, dim=2)
+        norms = ensure_point_list(norms, dim=1).reshape(norms.size)
+        xi, alpha = self.xi, self.alpha
+
+        m = lens_points / self.focal_length
+        r2 = np.sum(m * m, axis=1)
+        # The image of the field of view is bounded for alpha > 0.5
+        root = 1 - (2 * alpha - 1) * r2
+        r2[root < 0] = np.nan
+        mz = (1 - alpha * alpha * r2) / (alpha * np.sqrt(np.maximum(root, 0)) + 1 - alpha)
+        factor = (mz * xi + np.sqrt(mz * mz + (1 - xi * xi) * r2)) / (mz * mz + r2)
+        rays = factor[:, np.newaxis] * np.column_stack((m, mz))
+        rays[:, 2] -= xi
+        return rays * (norms / np.linalg.norm(rays, axis=1))[:, np.newaxis]
+
+
+LENS_CLASSES = {lens_cls.model: lens_cls
+                for lens_cls in (RadialPolyCamProjection, KannalaBrandtProjection, DoubleSphereProjection)}
+
+
+def create_lens(intrinsic: dict) -> Projection:
+    """
+    Creates the lens of the 'model' of a calibration json intrinsic, radial_poly if it has none.
+    """
+    model = intrinsic.get('model', 'radial_poly')
+    if model not in LENS_CLASSES:
+        raise ValueError(f"unknown lens model '{model}', expected one of {sorted(LENS_CLASSES)}")
+    return LENS_CLASSES[model].from_intrinsic(intrinsic)
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+def _absolute_principle_point(size, principle_point):
+    return 0.5 * size + np.array([principle_point[0], principle_point[1]], dtype=float) - 0.5
+
+
+def _restore_pose(data):
+    values = np.frombuffer(data, dtype=np.float64)
+    return Pose(values[0:9].reshape(3, 3), values[9:12])
+
+
+class Pose(object):
+    """
+    Immutable rigid transform from camera to world coordinates. The inverse is computed in closed form (R^T, -R^T t)
+    on first use, and updates return new poses, so a pose can be shared between threads without copies. Pickled as the
+    12 raw doubles of R and t.
+    """
+    __slots__ = ('_matrix', '_inv_matrix')
+
+    def __init__(self, rotation, translation):
+        matrix = np.empty((4, 4))
+        matrix[0:3, 0:3] = rotation
+        matrix[0:3, 3] = translation
+        matrix[3] = (0, 0, 0, 1)
+        object.__setattr__(self, '_matrix', _read_only(matrix))
+        object.__setattr__(self, '_inv_matrix', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Pose is immutable, use with_rotation() or with_translation()')
+
+    def __reduce__(self):
+        return _restore_pose, (np.concatenate((self.rotation.ravel(), self.translation)).tobytes(),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f'Pose(rotation={self.rotation.tolist()}, translation={self.translation.tolist()})'
+
+    matrix = property(lambda self: self._matrix)
+    rotation = property(lambda self: self._matrix[0:3, 0:3])
+    translation = property(lambda self: self._matrix[0:3, 3])
+
+    @property
+    def inv_matrix(self):
+        if self._inv_matrix is None:
+            # Concurrent first uses compute the same value, whichever is kept
+            rotation_inv = self._matrix[0:3, 0:3].T
+            inv_matrix = np.empty((4, 4))
+            inv_matrix[0:3, 0:3] = rotation_inv
+            inv_matrix[0:3, 3] = -rotation_inv @ self._matrix[0:3, 3]
+            inv_matrix[3] = (0, 0, 0, 1)
+            object.__setattr__(self, '_inv_matrix', _read_only(inv_matrix))
+        return self._inv_matrix
+
+    def inverse(self):
+        return Pose(self.inv_matrix[0:3, 0:3], self.inv_matrix[0:3, 3])
+
+    def with_rotation(self, rotation):
+        return Pose(rotation, self.translation)
+
+    def with_translation(self, translation):
+        return Pose(self.rotation, translation)
+
+
+def _restore_camera(lens, data):
+    """
+    :param lens: lens model name whose parameters follow the camera's in data, or a lens object
+    """
+    values = np.frombuffer(data, dtype=np.float64)
+    if isinstance(lens, str):
+        lens = LENS_CLASSES[lens].from_params(values[17:])
+    cam = Camera.__new__(Camera)
+    object.__setattr__(cam, '_lens', lens)
+    object.__setattr__(cam, '_pose', Pose(values[0:9].reshape(3, 3), values[9:12]))
+    object.__setattr__(cam, '_size', _read_only(values[12:14].astype(int)))
+    object.__setattr__(cam, '_principle_point', _read_only(values[14:16].copy()))
+    object.__setattr__(cam, '_aspect_ratio', _read_only(np.array([1, values[16]])))
+    return cam
+
+
+class Camera(object):
+    """
+    Immutable camera made of a lens, a Pose and read-only intrinsic arrays. with_pose(), with_extr() and with_intr()
+    return updated cameras sharing everything else, so cameras can be shared between threads without copies. Pickled as
+    the lens model name and a single buffer of doubles.
+    """
+    __slots__ = ('_lens', '_pose', '_size', '_principle_point', '_aspect_ratio')
+
+    def __init__(self, lens: Projection, translation, rotation, size, principle_point,
+                 aspect_ratio: float = 1.0):
+        size = _read_only(np.array([size[0], size[1]], dtype=int))
+        object.__setattr__(self, '_lens', lens)
+        object.__setattr__(self, '_pose', Pose(rotation, translation))
+        object.__setattr__(self, '_size', size)
+        object.__setattr__(self, '_principle_point', _read_only(_absolute_principle_point(size, principle_point)))
+        object.__setattr__(self, '_aspect_ratio', _read_only(np.array([1, aspect_ratio], dtype=float)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Camera is immutable, use with_pose(), with_extr() or with_intr()')
+
+    def __reduce__(self):
+        values = [self.rotation.ravel(), self.translation, self._size, self._principle_point, self._aspect_ratio[1:]]
+        lens = getattr(self._lens, 'model', None)
+        if lens in LENS_CLASSES and type(self._lens) is LENS_CLASSES[lens]:
+            values.append(self._lens.params())
+        else:
+            lens = self._lens
+        return _restore_camera, (lens, np.concatenate(values).astype(np.float64).tobytes())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self._replace(_lens=copy.deepcopy(self._lens, memo))
+
+    def _replace(self, **fields):
+        cam = Camera.__new__(Camera)
+        for name in self.__slots__:
+            object.__setattr__(cam, name, fields[name] if name in fields else getattr(self, name))
+        return cam
+
+    lens = property(lambda self: self._lens)
+    pose = property(lambda self: self._pose)
+
+    size = property(lambda self: self._size)
+    width = property(lambda self: self._size[0])
+    height = property(lambda self: self._size[1])
+    cx = property(lambda self: self._principle_point[0])
+    cy = property(lambda self: self._principle_point[1])
+    cx_offset = property(lambda self: self._principle_point[0] - 0.5 * self._size[0] + 0.5)
+    cy_offset = property(lambda self: self._principle_point[1] - 0.5 * self._size[1] + 0.5)
+    aspect_ratio = property(lambda self: self._aspect_ratio[1])
+
+    rotation = property(lambda self: self._pose.rotation)
+    translation = property(lambda self: self._pose.translation)
+
+    def with_pose(self, pose: Pose):
+        return self._replace(_pose=pose)
+
+    def with_extr(self, translation, rotation):
+        return self._replace(_pose=Pose(rotation, translation))
+
+    def with_intr(self, lens: Projection, principle_point):
+        return self._replace(_lens=lens,
+                             _principle_point=_read_only(_absolute_principle_point(self._size, principle_point)))
+
+    def project_3d_to_2d(self, world_points: np.ndarray, do_clip=False, invalid_value=np.nan):
+        world_points = ensure_point_list(world_points, dim=4)
+
+        camera_points = world_points @ self._pose.inv_matrix.T
+        lens_points = self.lens.project_3d_to_2d(camera_points[:, 0:3], invalid_value=invalid_value)
+        screen_points = (lens_points * self._aspect_ratio) + self._principle_point
+        return self._apply_clip(screen_points, screen_points) if do_clip else screen_points
+
+    def project_2d_to_3d(self, screen_points: np.ndarray, norm: np.ndarray, do_clip=False):
+        return self._project_2d_to_3d(self._pose, screen_points, norm, do_clip)
+
+    def _project_2d_to_3d(self, pose: Pose, screen_points: np.ndarray, norm: np.ndarray, do_clip=False):
+        screen_points = ensure_point_list(screen_points, dim=2, concatenate=False, crop=False)
+        norm = ensure_point_list(norm[:, np.newaxis], dim=1, concatenate=False, crop=False)
+        lens_points = (screen_points - self._principle_point) / self._aspect_ratio
+        lens_points = self._apply_clip(lens_points, screen_points) if do_clip else lens_points
+
+        camera_points = self.lens.project_2d_to_3d(lens_points, norm)
+
+        camera_points = ensure_point_list(camera_points, dim=4)
+        world_points = camera_points @ pose.matrix.T
+        return world_points[:, 0:3]
+
+    def project_2d_to_3d_ground(self, screen_points: np.ndarray, do_clip=False):
+        pose = self._pose
+        world_points = self._project_2d_to_3d(pose, screen_points, norm=np.array([1]), do_clip=do_clip)
+        world_points_from_cam = world_points - pose.translation
+        z_ground_from_cam = - pose.translation[2]
+        zs_from_cam = world_points_from_cam[:, [2]]
+        scale = z_ground_from_cam / zs_from_cam
+        ground_points = world_points_from_cam * scale + pose.translation
+        return ground_points
+
+    def get_translation(self):
+        return self._pose.translation
+
+    def get_rotation(self):
+        return self._pose.rotation
+
+    def _apply_clip(self, points, clip_source) -> np.ndarray:
+        if self._size[0] == 0 or self._size[1] == 0:
+            raise RuntimeError('clipping without a size is not possible')
+        mask = (clip_source[:, 0] < 0) | (clip_source[:, 0] >= self._size[0]) | \
+               (clip_source[:, 1] < 0) | (clip_source[:, 1] >= self._size[1])
+
+        points[mask] = [np.nan]
+        return points
+
+
+class CameraRig(object):
+    """
+    Cameras of a multi-camera rig with their poses and lens coefficients stacked in arrays, so that points of all
+    cameras are projected in single vectorized calls. Points are given as (camera_id, point) batches: cam_ids[i] is the
+    index of the camera points[i] belongs to.
+
+    Lenses other than RadialPolyCamProjection ones of the same order are applied camera by camera, with their own
+    vectorized projections.
+    """
+    def __init__(self, cameras: list, names: list = None, configs: list = None):
+        """
+        :param configs: content of the calibration json files of the cameras, whose other fields are kept by
+                        save_json
+        """
+        assert len(cameras) > 0
+        assert configs is None or len(configs) == len(cameras)
+        self.names = list(names) if names is not None else [str(i) for i in range(len(cameras))]
+        self._configs = list(configs) if configs is not None else [{} for _ in cameras]
+        self._poses = np.stack([cam.pose.matrix for cam in cameras])
+        self._inv_poses = np.stack([cam.pose.inv_matrix for cam in cameras])
+        self._lenses = [cam.lens for cam in cameras]
+        if all(type(lens) is RadialPolyCamProjection for lens in self._lenses) and \
+                len({lens.coefficients.size for lens in self._lenses}) == 1:
+            self._coefficients = np.stack([lens.coefficients for lens in self._lenses]).astype(float)
+        else:
+            self._coefficients = None
+        self._principle_points = np.stack([cam._principle_point for cam in cameras])
+        self._aspect_ratios = np.stack([cam._aspect_ratio for cam in cameras])
+        self._sizes = np.stack([cam.size for cam in cameras])
+
+    def __len__(self):
+        return self._poses.shape[0]
+
+    rotations = property(lambda self: self._poses[:, 0:3, 0:3])
+    translations = property(lambda self: self._poses[:, 0:3, 3])
+
+    def camera(self, cam_id) -> Camera:
+        """
+        Returns a standalone Camera with the parameters of camera cam_id.
+        """
+        size = self._sizes[cam_id]
+        return Camera(lens=self._lenses[cam_id],
+                      translation=self.translations[cam_id], rotation=self.rotations[cam_id], size=size,
+                      principle_point=self._principle_points[cam_id] - 0.5 * size + 0.5,
+                      aspect_ratio=self._aspect_ratios[cam_id][1])
+
+    def update_extr(self, cam_id, translation, rotation):
+        pose = Pose(rotation, translation)
+        self._poses[cam_id] = pose.matrix
+        self._inv_poses[cam_id] = pose.inv_matrix
+
+    def project_3d_to_2d(self, cam_ids: np.ndarray, world_points: np.ndarray, invalid_value=np.nan):
+        cam_ids = np.asarray(cam_ids)
+        world_points = ensure_point_list(world_points, dim=4)
+
+        camera_points = np.einsum('nij,nj->ni', self._inv_poses[cam_ids], world_points)[:, 0:3]
+        if self._coefficients is None:
+            lens_points = np.zeros((len(cam_ids), 2))
+            for cam_id in np.unique(cam_ids):
+                mask = cam_ids == cam_id
+                lens_points[mask] = self._lenses[cam_id].project_3d_to_2d(camera_points[mask], invalid_value)
+            return lens_points * self._aspect_ratios[cam_ids] + self._principle_points[cam_ids]
+
+        chi = np.sqrt(camera_points[:, 0] * camera_points[:, 0] + camera_points[:, 1] * camera_points[:, 1])
+        theta = np.pi / 2.0 - np.arctan2(camera_points[:, 2], chi)
+        rho = self._theta_to_rho(cam_ids, theta)
+        lens_points = np.divide(rho, chi, out=np.zeros_like(rho), where=(chi != 0))[:, np.newaxis] * \
+            camera_points[:, 0:2]
+        lens_points[(chi == 0) & (camera_points[:, 2] == 0)] = invalid_value
+        return lens_points * self._aspect_ratios[cam_ids] + self._principle_points[cam_ids]
+
+    def project_2d_to_3d_ground(self, cam_ids: np.ndarray, screen_points: np.ndarray):
+        cam_ids = np.asarray(cam_ids)
+        screen_points = ensure_point_list(screen_points, dim=2, concatenate=False, crop=False)
+
+        lens_points = (screen_points - self._principle_points[cam_ids]) / self._aspect_ratios[cam_ids]
+        if self._coefficients is None:
+            rays_camera = np.zeros((len(cam_ids), 3))
+            for cam_id in np.unique(cam_ids):
+                mask = cam_ids == cam_id
+                rays_camera[mask] = self._lenses[cam_id].project_2d_to_3d(lens_points[mask], np.ones((1, 1)))
+        else:
+            rhos = np.linalg.norm(lens_points, axis=1)
+            thetas = self._rho_to_theta(cam_ids, rhos)
+            xy = np.divide(np.sin(thetas), rhos, out=np.zeros_like(rhos), where=(rhos != 0))[:, np.newaxis] * \
+                lens_points
+            rays_camera = np.column_stack((xy, np.cos(thetas)))
+        rays_world = np.einsum('nij,nj->ni', self.rotations[cam_ids], rays_camera)
+        translations = self.translations[cam_ids]
+        scale = - translations[:, [2]] / rays_world[:, [2]]
+        return rays_world * scale + translations
+
+    def _theta_to_rho(self, cam_ids, theta):
+        power = np.arange(1, self._coefficients.shape[1] + 1)
+        return np.sum(self._coefficients[cam_ids] * np.power(theta[:, np.newaxis], power), axis=1)
+
+    def _rho_to_theta(self, cam_ids, rho, num_iter=20, tol=1e-12):
+        """
+        Vectorized Newton iterations from the linear approximation rho / k1, which converge to the smallest positive
+        root for the monotonic polynomials of fisheye lenses. Points that do not converge fall back to
+        RadialPolyCamProjection's root solver.
+        """
+        coefficients = self._coefficients[cam_ids]
+        power = np.arange(1, coefficients.shape[1] + 1)
+        theta = rho / coefficients[:, 0]
+        for _ in range(num_iter):
+            value = np.sum(coefficients * np.power(theta[:, np.newaxis], power), axis=1) - rho
+            derivative = np.sum(coefficients * power * np.power(theta[:, np.newaxis], power - 1), axis=1)
+            step = np.divide(value, derivative, out=np.zeros_like(value), where=(derivative != 0))
+            theta = theta - step
+            if np.all(np.abs(step) < tol):
+                break
+        not_converged = ~(np.abs(step) < tol) | (np.abs(theta) >= np.pi)
+        for i in np.flatnonzero(not_converged):
+            theta[i] = RadialPolyCamProjection(coefficients[i])._rho_to_theta(rho[i:i + 1])[0]
+        return theta
+
+    @classmethod
+    def from_json(cls, paths: list, names: list = None):
+        """
+        Loads a rig from one calibration json file per camera.
+        """
+        configs = []
+        for path in paths:
+            with open(path) as f:
+                configs.append(json.load(f))
+        return cls([cam_from_config(config) for config in configs], names, configs)
+
+    def save_json(self, paths: list):
+        """
+        Saves the calibration of each camera to its own json file, in the format read by read_cam_from_json. Other
+        fields of the files the rig was loaded from are kept.
+        """
+        from scipy.spatial.transform import Rotation as SciRot
+
+        assert len(paths) == len(self)
+        for cam_id, (path, config) in enumerate(zip(paths, self._configs)):
+            config = dict(config)
+            # Intrinsics are never changed by the rig, the ones loaded are written back as they are
+            if 'intrinsic' not in config:
+                cx_offset, cy_offset = self._principle_points[cam_id] - 0.5 * self._sizes[cam_id] + 0.5
+                config['intrinsic'] = {'aspect_ratio': float(self._aspect_ratios[cam_id][1]),
+                                       'cx_offset': float(cx_offset), 'cy_offset': float(cy_offset),
+                                       'height': float(self._sizes[cam_id][1]),
+                                       **self._lenses[cam_id].to_intrinsic(),
+                                       'width': float(self._sizes[cam_id][0])}
+            config['extrinsic'] = {'quaternion': SciRot.from_matrix(self.rotations[cam_id]).as_quat().tolist(),
+                                   'translation': self.translations[cam_id].tolist()}
+            with open(path, 'w') as f:
+                json.dump(config, f, indent=4)
+
+
+def create_img_projection_maps(source_cam: Camera, destination_cam: Camera):
+    """
+    Generates maps for cv2.remap to remap from one camera to another
+    """
+    u_map = np.zeros((destination_cam.height, destination_cam.width, 1), dtype=np.float32)
+    v_map = np.zeros((destination_cam.height, destination_cam.width, 1), dtype=np.float32)
+
+    destination_points_b = np.arange(destination_cam.height)
+
+    for u_px in range(destination_cam.width):
+        destination_points_a = np.ones(destination_cam.height) * u_px
+        destination_points = np.vstack((destination_points_a, destination_points_b)).T
+
+        source_points = source_cam.project_3d_to_2d(
+            destination_cam.project_2d_to_3d(destination_points, norm=np.array([1])))
+
+        u_map.T[0][u_px] = source_points.T[0]
+        v_map.T[0][u_px] = source_points.T[1]
+
+    map1, map2 = cv2.convertMaps(u_map, v_map, dstmap1type=cv2.CV_16SC2, nninterpolation=False)
+    return map1, map2
+
+
+def create_bev_projection_maps(source_cam: Camera, bev_range: int, bev_size: int):
+    """
+    Generate maps to remap from one camera to bird-eye-view (BEV) image.
+
+    :param bev_range: BEV range in meters
+    :param bev_size: BEV image size in pixels
+    """
+    u_map = np.zeros((bev_size, bev_size, 1), dtype=np.float32)
+    v_map = np.zeros((bev_size, bev_size, 1), dtype=np.float32)
+    scale_pxl_to_meter = bev_range / bev_size
+
+    bev_points_v = np.arange(bev_size)
+    bev_points_world_z = np.zeros(bev_size)
+
+    for u_px in range(bev_size):
+        bev_points_u = np.ones(bev_size) * u_px
+        bev_points_world_x = bev_range / 2 - bev_points_v * scale_pxl_to_meter
+        bev_points_world_y = bev_range / 2 - bev_points_u * scale_pxl_to_meter
+        bev_points_world = np.column_stack((bev_points_world_x, bev_points_world_y, bev_points_world_z))
+        source_points = source_cam.project_3d_to_2d(bev_points_world)
+        u_map.T[0][u_px] = source_points.T[0]
+        v_map.T[0][u_px] = source_points.T[1]
+
+    map1, map2 = cv2.convertMaps(u_map, v_map, dstmap1type=cv2.CV_16SC2, nninterpolation=False)
+    return map1, map2
+
+def create_bev_projection_maps_tile(source_cam: Camera, bev_range: float, bev_size: int, rows: slice, cols: slice):
+    """
+    Maps of a tile of the BEV image, same as create_bev_projection_maps(source_cam, bev_range, bev_size)[rows, cols]
+    without computing the whole image.
+
+    :param rows: rows of the tile, slice with start and stop within the image
+    :param cols: columns of the tile, slice with start and stop within the image
+    """
+    scale_pxl_to_meter = bev_range / bev_size
+    bev_points_v, bev_points_u = np.mgrid[rows, cols]
+    bev_points_world_x = bev_range / 2 - bev_points_v.ravel() * scale_pxl_to_meter
+    bev_points_world_y = bev_range / 2 - bev_points_u.ravel() * scale_pxl_to_meter
+    bev_points_world = np.column_stack((bev_points_world_x, bev_points_world_y, np.zeros(bev_points_world_x.size)))
+    source_points = source_cam.project_3d_to_2d(bev_points_world)
+    u_map = source_points[:, 0].astype(np.float32).reshape(bev_points_v.shape)
+    v_map = source_points[:, 1].astype(np.float32).reshape(bev_points_v.shape)
+    map1, map2 = cv2.convertMaps(u_map, v_map, dstmap1type=cv2.CV_16SC2, nninterpolation=False)
+    return map1, map2
+
+
+def bev_points_world_to_img(bev_range: float, bev_size: int, bev_points_world: np.ndarray):
+    """
+    Convert world ground points coordinates (in meter) to bird-eye-view (BEV) image coordinates (in pixel).
+
+    :param bev_range: BEV range in meters
+    :param bev_size: BEV image size in pixels
+    :param bev_points_world: world ground points coordinates (in meter)
+    """
+    scale_meter_to_pxl = bev_size / bev_range
+    bev_points_img_u = (bev_range / 2 - bev_points_world[1]) * scale_meter_to_pxl
+    bev_points_img_v = (bev_range / 2 - bev_points_world[0]) * scale_meter_to_pxl
+    return np.stack(((bev_points_img_u, bev_points_img_v))).astype(np.int32)
+
+
+def read_cam_from_json(path):
+    """
+    Generates a Camera object from a json file
+    """
+    with open(path) as f:
+        config = json.load(f)
+    return cam_from_config(config)
+
+
+def cam_from_config(config: dict):
+    """
+    Generates a Camera object from the content of a calibration json file
+    """
+    # Imported here: scipy.spatial is slow to import and nothing else in this module needs it
+    from scipy.spatial.transform import Rotation as SciRot
+
+    intrinsic = config['intrinsic']
+
+    cam = Camera(
+        rotation=SciRot.from_quat(config['extrinsic']['quaternion']).as_matrix(),
+        translation=config['extrinsic']['translation'],
+        lens=create_lens(intrinsic),
+        size=(intrinsic['width'], intrinsic['height']),
+        principle_point=(intrinsic['cx_offset'], intrinsic['cy_offset']),
+        aspect_ratio=intrinsic['aspect_ratio']
+    )
+
+    return cam
@@ -0,0 +1,117 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+from .utils import CAM_PAIRS
+
+
+def _canonical_json(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def _points_to_json(pts_pairs):
+    return {f"{cam_a}_{cam_b}": {cam_a: np.asarray(pair[cam_a]).tolist(), cam_b: np.asarray(pair[cam_b]).tolist()}
+            for (cam_a, cam_b), pair in zip(CAM_PAIRS, pts_pairs)}
+
+
+def _correspondences(points):
+    """
+    Set of (pair, point in first camera, point in second camera) of a points dict as stored in the cache.
+    """
+    return {(pair_name, tuple(pt_a), tuple(pt_b))
+            for pair_name, pair in points.items()
+            for pt_a, pt_b in zip(*[pair[cam] for cam in pair_name.split("_")])}
+
+
+class ResultCache(object):
+    """
+    Content-addressed cache of optimization results. An entry is keyed by the sha256 of the initial calibrations, the
+    clicked keypoints and the solver configuration, and stored as <key>.json in the cache directory.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_inputs(calibs, pts_pairs, solver_config):
+        """
+        :param calibs: (intrinsic, quaternion, translation) of each camera, as returned by utils.read_calib
+        :param pts_pairs: keypoints of each pair in CAM_PAIRS order, see utils.read_points
+        :param solver_config: json-serializable description of everything else that changes the result
+        """
+        return {
+            "calibs": [{"intrinsic": intr, "quaternion": list(map(float, quat)), "translation": list(map(float, t))}
+                       for intr, quat, t in calibs],
+            "points": _points_to_json(pts_pairs),
+            "solver": solver_config,
+        }
+
+    @staticmethod
+    def make_key(inputs):
+        return hashlib.sha256(_canonical_json(inputs).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, inputs):
+        """
+        Returns the stored result for exactly these inputs, or None.
+        """
+        path = self._path(self.make_key(inputs))
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)["result"]
+
+    def put(self, inputs, result):
+        """
+        :param result: json-serializable optimized extrinsics and diagnostics
+        """
+        path = self._path(self.make_key(inputs))
+        # Write then rename so that concurrent readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"inputs": inputs, "result": result}, f)
+        os.replace(tmp_path, path)
+
+    def nearest(self, inputs, max_changed=5):
+        """
+        Returns the stored result of the run with the same calibrations and solver configuration whose keypoints differ
+        from these inputs by the fewest correspondences (added or removed), if at most max_changed, or None.
+        Meant as a warm start when only a few clicks changed.
+        """
+        correspondences = _correspondences(inputs["points"])
+        best_result, best_changed = None, max_changed + 1
+        for path in glob.glob(os.path.join(self.cache_dir, "*.json")):
+            with open(path) as f:
+                entry = json.load(f)
+            if entry["inputs"]["calibs"] != inputs["calibs"] or entry["inputs"]["solver"] != inputs["solver"]:
+                continue
+            changed = len(correspondences ^ _correspondences(entry["inputs"]["points"]))
+            if changed < best_changed:
+                best_result, best_changed = entry["result"], changed
+        return best_result
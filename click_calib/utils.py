@@ -0,0 +1,157 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+from scipy.spatial.transform import Rotation as SciRot
+import json
+import struct
+import numpy as np
+from .projection import Camera, create_lens
+
+# Example data (WoodScape frames) shipped with the repository, used as CLI defaults
+EXAMPLE_DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAM_NAMES = ("front", "left", "right", "rear")
+EXAMPLE_FRAME_NAMES = ("00164_FV", "00165_MVL", "00166_MVR", "00167_RV")
+# Pairs of adjacent cameras sharing clicked keypoints, in the order used by the optimizer
+CAM_PAIRS = (("front", "left"), ("front", "right"), ("rear", "left"), ("rear", "right"))
+
+
+def example_calib_files(calib_set="original"):
+    return [os.path.join(EXAMPLE_DATA_DIR, "calibrations", calib_set, f"{name}.json") for name in EXAMPLE_FRAME_NAMES]
+
+
+def example_image_files():
+    return [os.path.join(EXAMPLE_DATA_DIR, "images", "fisheye", f"{name}.png") for name in EXAMPLE_FRAME_NAMES]
+
+
+def example_points_file():
+    return os.path.join(EXAMPLE_DATA_DIR, "keypoints", "example.json")
+
+def quat_to_mat(quat):
+    return SciRot.from_quat(quat).as_matrix()
+
+
+def mat_to_quat(mat):
+    return SciRot.from_matrix(mat).as_quat()
+
+
+def rotvec_to_mat(rotvec, rot_ini):
+    """
+    Rotation matrix of the pose rot_ini perturbed by the rotation vector rotvec (in world frame). This is the minimal
+    3-DoF rotation parametrization used by the optimizers, local around rot_ini.
+    """
+    return SciRot.from_rotvec(rotvec).as_matrix() @ rot_ini
+
+
+def init_fisheye_cam(intr, quat, t):
+    cam = Camera(
+        rotation=quat_to_mat(quat),
+        translation=t,
+        lens=create_lens(intr),
+        size=(intr['width'], intr['height']),
+        principle_point=(intr['cx_offset'], intr['cy_offset']),
+        aspect_ratio=intr['aspect_ratio']
+    )
+    return cam
+
+
+def read_calib(path):
+    with open(path) as f:
+        calib = json.load(f)
+    intr = calib['intrinsic']
+    quat = calib['extrinsic']['quaternion']
+    t = calib['extrinsic']['translation']
+    return intr, quat, t
+
+
+def write_calib(intr, quat, t, save_path):
+    calib = {}
+    calib["extrinsic"] = {"quaternion": quat, "translation": t}
+    calib["intrinsic"] = intr
+    with open(save_path, "w") as f:
+        json.dump(calib, f, indent=4)
+
+
+def read_points(path):
+    """
+    Reads clicked keypoints from a json file, e.g. {"front_left": {"front": [[u, v], ...], "left": [[u, v], ...]}, ...}
+    with one entry per pair in CAM_PAIRS.
+    """
+    with open(path) as f:
+        points = json.load(f)
+    pts_pairs = []
+    for cam_a, cam_b in CAM_PAIRS:
+        pair = points[f"{cam_a}_{cam_b}"]
+        pts_pairs.append({cam_a: np.array(pair[cam_a]).reshape(-1, 2), cam_b: np.array(pair[cam_b]).reshape(-1, 2)})
+    return pts_pairs
+
+
+def write_points(pts_pairs, save_path):
+    points = {}
+    for (cam_a, cam_b), pair in zip(CAM_PAIRS, pts_pairs):
+        points[f"{cam_a}_{cam_b}"] = {cam_a: np.asarray(pair[cam_a]).tolist(), cam_b: np.asarray(pair[cam_b]).tolist()}
+    with open(save_path, "w") as f:
+        json.dump(points, f, indent=4)
+
+
+# Compiled remap tables (cv2.convertMaps output) are stored as a fixed-size raw header followed by the contiguous
+# map1 (CV_16SC2, int16 x 2) and map2 (uint16) payloads, so that they can be memory-mapped without any parsing.
+MAPS_MAGIC = b"CCALMAPS"
+MAPS_VERSION = 1
+MAPS_HEADER_FORMAT = "<8sIII"
+MAPS_HEADER_SIZE = 64
+
+
+def write_maps(map1, map2, save_path):
+    """
+    Written to a temporary file first and renamed, so that concurrent readers never map a partial file.
+    """
+    height, width = map1.shape[:2]
+    assert map1.dtype == np.int16 and map1.shape == (height, width, 2)
+    assert map2.dtype == np.uint16 and map2.shape == (height, width)
+    header = struct.pack(MAPS_HEADER_FORMAT, MAPS_MAGIC, MAPS_VERSION, height, width)
+    tmp_path = f"{save_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(MAPS_HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(map1).tobytes())
+        f.write(np.ascontiguousarray(map2).tobytes())
+    os.replace(tmp_path, save_path)
+
+
+def read_maps(path):
+    """
+    Memory-maps compiled remap tables written by write_maps. Nothing is copied: the arrays are read-only views on the
+    page cache, which are shared by all processes mapping the same file.
+    """
+    with open(path, "rb") as f:
+        header = f.read(struct.calcsize(MAPS_HEADER_FORMAT))
+    if len(header) < struct.calcsize(MAPS_HEADER_FORMAT):
+        raise ValueError(f"{path} is not a compiled remap table file (version {MAPS_VERSION})")
+    magic, version, height, width = struct.unpack(MAPS_HEADER_FORMAT, header)
+    if magic != MAPS_MAGIC or version != MAPS_VERSION:
+        raise ValueError(f"{path} is not a compiled remap table file (version {MAPS_VERSION})")
+    # map1 is 2 x int16 and map2 is uint16 per pixel
+    if os.path.getsize(path) != MAPS_HEADER_SIZE + 6 * height * width:
+        raise ValueError(f"{path} is truncated or has trailing data, expected {height}x{width} remap tables")
+    map1 = np.memmap(path, dtype=np.int16, mode="r", offset=MAPS_HEADER_SIZE, shape=(height, width, 2))
+    map2 = np.memmap(path, dtype=np.uint16, mode="r", offset=MAPS_HEADER_SIZE + map1.nbytes, shape=(height, width))
+    return map1, map2
@@ -0,0 +1,107 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+
+import http.client
+import json
+import threading
+import numpy as np
+import cv2
+import pytest
+from click_calib.bev_server import BevService, UnixHTTPConnection, make_server
+from click_calib.generate_bev_img import generate_bev_all_cams
+from click_calib.projection import read_cam_from_json
+from click_calib.utils import example_calib_files, example_image_files
+
+BEV_SIZE = 64
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def server(request, tmp_path):
+    """
+    (service, function opening a connection to it), for a server on a free localhost port or on a Unix socket
+    """
+    service = BevService(cache_size=2, num_workers=2, max_bev_size=256)
+    if request.param == "tcp":
+        server = make_server(service, port=0)
+        connect = lambda: http.client.HTTPConnection(*server.server_address, timeout=60)
+    else:
+        socket_path = str(tmp_path / "bev.sock")
+        server = make_server(service, unix_socket=socket_path)
+        connect = lambda: UnixHTTPConnection(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, connect
+    server.shutdown()
+    server.server_close()
+    service.close()
+    thread.join()
+
+
+def _request(connect, method, path, body=None):
+    conn = connect()
+    try:
+        conn.request(method, path, body=None if body is None else json.dumps(body),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def _render_body(**fields):
+    return {"calibs": example_calib_files("optimized"), "images": example_image_files(), "bev_size": BEV_SIZE,
+            **fields}
+
+
+def test_render_and_stats(server):
+    service, connect = server
+    status, body = _request(connect, "POST", "/render", _render_body())
+    assert status == 200
+    bev_img = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+
+    cams = [read_cam_from_json(path) for path in example_calib_files("optimized")]
+    imgs = [cv2.imread(path) for path in example_image_files()]
+    assert np.array_equal(bev_img, generate_bev_all_cams(*cams, *imgs, 'all', 25, BEV_SIZE))
+
+    # Same rig again: served from the map cache
+    assert _request(connect, "POST", "/render", _render_body())[0] == 200
+
+    status, body = _request(connect, "GET", "/stats")
+    assert status == 200
+    stats = json.loads(body)
+    assert stats["requests"] == 2 and stats["errors"] == 0
+    assert stats["map_misses"] == 1 and stats["map_hits"] == 1
+
+
+def test_bad_requests(server):
+    service, connect = server
+    assert _request(connect, "POST", "/render", _render_body(bev_size=100000))[0] == 400
+    assert _request(connect, "POST", "/render", _render_body(bev_range=-1))[0] == 400
+    assert _request(connect, "POST", "/render", _render_body(images=["missing.png"] * 4))[0] == 400
+    assert _request(connect, "GET", "/missing")[0] == 404
+
+    # Remapping after close() fails inside the service, the client still gets an answer
+    service.close()
+    assert _request(connect, "POST", "/render", _render_body())[0] == 500
+    assert json.loads(_request(connect, "GET", "/stats")[1])["errors"] == 4
@@ -0,0 +1,57 @@
+# Copyright 2024 Valeo Brain Division and contributors
+#
+# Author: Lihao Wang <lihao.wang@valeo.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+
+import numpy as np
+import cv2
+import pytest
+from click_calib.generate_bev_img import generate_bev_all_cams, generate_bev_all_cams_tiled
+from click_calib.projection import read_cam_from_json
+from click_calib.utils import example_calib_files, example_image_files
+
+# Small and not a multiple of the tile sizes below, so that the last tiles are partial
+BEV_SIZE = 90
+
+
+@pytest.fixture(scope="module")
+def rig():
+    cams = [read_cam_from_json(path) for path in example_calib_files("optimized")]
+    imgs = [cv2.imread(path) for path in example_image_files()]
+    return cams, imgs
+
+
+@pytest.mark.parametrize("overlay_opt", ["all", "fr", "lr"])
+def test_parallel_matches_sequential(rig, overlay_opt):
+    cams, imgs = rig
+    expected = generate_bev_all_cams(*cams, *imgs, overlay_opt, 25, BEV_SIZE)
+    bev_img = generate_bev_all_cams(*cams, *imgs, overlay_opt, 25, BEV_SIZE, num_workers=3, tile_rows=7)
+    assert np.array_equal(bev_img, expected)
+
+
+@pytest.mark.parametrize("overlay_opt", ["all", "fr", "lr"])
+def test_tiled_matches_sequential(rig, overlay_opt):
+    cams, imgs = rig
+    expected = generate_bev_all_cams(*cams, *imgs, overlay_opt, 25, BEV_SIZE)
+    bev_img = np.zeros((BEV_SIZE, BEV_SIZE, 3), dtype=np.uint8)
+    generate_bev_all_cams_tiled(*cams, *imgs, bev_img, overlay_opt, 25, tile_size=32)
+    assert np.array_equal(bev_img, expected)